@@ -0,0 +1,80 @@
+"""
+Compare HTTP/1.1 and HTTP/2 for many concurrent `async_validate` calls.
+
+Uses Cloudflare's always-pass test secret against the real siteverify
+endpoint, so network access is required. Reports wall time, latency
+percentiles and the peak number of open connections (sockets) in the pool.
+
+Usage:
+    uv run python benchmarks/bench_http2.py [concurrency] [rounds]
+"""
+
+from __future__ import annotations
+
+import asyncio
+import statistics
+import sys
+import time
+from typing import List
+
+from pyturnstile import AsyncHttpxTransport, Turnstile
+
+TEST_SECRET = "1x0000000000000000000000000000000AA"
+TEST_TOKEN = "XXXX.DUMMY.TOKEN.XXXX"
+
+
+async def _sample_connections(turnstile: Turnstile, peak: List[int]) -> None:
+    transport = turnstile._async_transport
+    lanes = getattr(transport, "lanes", [transport])
+    pools = [lane.client._transport._pool for lane in lanes]  # type: ignore
+    while True:
+        peak[0] = max(peak[0], sum(len(pool.connections) for pool in pools))
+        await asyncio.sleep(0.001)
+
+
+async def _timed(turnstile: Turnstile) -> float:
+    start = time.perf_counter()
+    await turnstile.async_validate(TEST_TOKEN)
+    return time.perf_counter() - start
+
+
+async def run(http2: bool, concurrency: int, rounds: int) -> None:
+    if http2:
+        turnstile = Turnstile(TEST_SECRET, http2=True)
+    else:
+        turnstile = Turnstile(TEST_SECRET, async_transport=AsyncHttpxTransport())
+    transport = turnstile._async_transport
+    assert transport is not None
+
+    peak = [0]
+    latencies: List[float] = []
+    sampler = asyncio.ensure_future(_sample_connections(turnstile, peak))
+    start = time.perf_counter()
+    for _ in range(rounds):
+        latencies += await asyncio.gather(
+            *(_timed(turnstile) for _ in range(concurrency))
+        )
+    elapsed = time.perf_counter() - start
+    sampler.cancel()
+    await transport.aclose()
+
+    latencies.sort()
+    p50 = statistics.median(latencies) * 1000
+    p99 = latencies[int(len(latencies) * 0.99) - 1] * 1000
+    name = "HTTP/2" if http2 else "HTTP/1.1"
+    print(
+        f"{name:>8}: {elapsed:6.2f}s total, p50 {p50:7.1f} ms, p99 {p99:7.1f} ms, "
+        f"peak connections {peak[0]}"
+    )
+
+
+def main() -> None:
+    concurrency = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    print(f"{concurrency} concurrent validations x {rounds} rounds")
+    asyncio.run(run(False, concurrency, rounds))
+    asyncio.run(run(True, concurrency, rounds))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Benchmark sync validation throughput as the number of threads grows.
+
+Compares opening an `httpx.Client` per call (what `validate()` without a
+client does) against a shared `Turnstile`, whose pooled transport is created
+once and then used by every thread without locking. Requests are answered by
+an in-process `httpx.MockTransport`, optionally after `latency_ms` of sleep to
+stand in for the network round trip.
+
+Run it on a regular and a free-threaded build to compare:
+
+    uv run python benchmarks/bench_thread_scaling.py [calls_per_thread] [latency_ms]
+    uv run --python 3.13t python benchmarks/bench_thread_scaling.py
+"""
+
+from __future__ import annotations
+
+import sys
+import threading
+import time
+from typing import Callable, List
+
+import httpx
+
+from pyturnstile import HttpxTransport, Turnstile, validate
+
+SECRET = "1x0000000000000000000000000000000AA"
+TOKEN = "0." + "x" * 700
+THREADS = [1, 2, 4, 8, 16]
+BODY = b'{"success": true, "error-codes": [], "hostname": "example.com"}'
+
+
+def make_handler(latency: float) -> Callable[[httpx.Request], httpx.Response]:
+    def handler(request: httpx.Request) -> httpx.Response:
+        if latency:
+            time.sleep(latency)
+        return httpx.Response(
+            200, content=BODY, headers={"Content-Type": "application/json"}
+        )
+
+    return handler
+
+
+def run_threads(threads: int, calls: int, call: Callable[[], object]) -> float:
+    """Run `calls` calls on each of `threads` threads and return calls per second."""
+    barrier = threading.Barrier(threads + 1)
+
+    def worker() -> None:
+        barrier.wait()
+        for _ in range(calls):
+            call()
+
+    workers: List[threading.Thread] = [
+        threading.Thread(target=worker) for _ in range(threads)
+    ]
+    for thread in workers:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in workers:
+        thread.join()
+    return threads * calls / (time.perf_counter() - start)
+
+
+def main() -> None:
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    latency = float(sys.argv[2]) / 1000 if len(sys.argv) > 2 else 0.0
+    handler = make_handler(latency)
+    mock = httpx.MockTransport(handler)
+
+    def client_per_call() -> object:
+        with httpx.Client(transport=mock) as client:
+            return validate(TOKEN, SECRET, client=client)
+
+    shared_client = httpx.Client(transport=mock)
+    turnstile = Turnstile(SECRET, transport=HttpxTransport(shared_client))
+
+    gil = getattr(sys, "_is_gil_enabled", lambda: True)()
+    print(
+        f"Python {sys.version.split()[0]}, GIL {'enabled' if gil else 'disabled'}, "
+        f"{calls} calls/thread, {latency * 1000:g} ms latency"
+    )
+    print(f"{'threads':>8} {'client per call':>18} {'shared Turnstile':>18}")
+    baseline = {}
+    for threads in THREADS:
+        row = []
+        for name, call in [
+            ("client per call", client_per_call),
+            ("shared", lambda: turnstile.validate(TOKEN)),
+        ]:
+            rate = run_threads(threads, calls, call)
+            baseline.setdefault(name, rate)
+            row.append(f"{rate:9.0f}/s ({rate / baseline[name]:4.1f}x)")
+        print(f"{threads:>8} {row[0]:>18} {row[1]:>18}")
+    shared_client.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,42 @@
 """PyTurnstile: A Python library for validating Cloudflare Turnstile tokens."""
 
 from ._core import TurnstileResponse, TurnstileValidationError, async_validate, validate
+from ._middleware import TurnstileMiddleware, TurnstileWSGIMiddleware
+from ._registry import TurnstileRegistry
+from ._sidecar import AsyncUnixSocketTransport, UnixSocketTransport
+from ._transports import (
+    AiohttpTransport,
+    AsyncHttp2Transport,
+    AsyncHttpxTransport,
+    AsyncMemoryTransport,
+    AsyncTransport,
+    Http2Transport,
+    HttpxTransport,
+    MemoryTransport,
+    Transport,
+    Urllib3Transport,
+)
 from ._turnstile import Turnstile
 
 __all__ = [
     "Turnstile",
+    "TurnstileRegistry",
+    "TurnstileMiddleware",
+    "TurnstileWSGIMiddleware",
     "TurnstileResponse",
     "TurnstileValidationError",
     "validate",
     "async_validate",
+    "Transport",
+    "AsyncTransport",
+    "HttpxTransport",
+    "AsyncHttpxTransport",
+    "Http2Transport",
+    "AsyncHttp2Transport",
+    "Urllib3Transport",
+    "AiohttpTransport",
+    "MemoryTransport",
+    "AsyncMemoryTransport",
+    "UnixSocketTransport",
+    "AsyncUnixSocketTransport",
 ]
@@ -0,0 +1,6 @@
+"""Allow running the `pyturnstile` command as `python -m pyturnstile`."""
+
+from ._cli import main
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""Short-lived cache for terminal Turnstile validation failures."""
+
+from __future__ import annotations
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional, Tuple
+
+from ._types import NegativeCacheStats, TurnstileResponse, TurnstileResponseDict
+
+TERMINAL_ERROR_CODES = frozenset({"invalid-input-response", "timeout-or-duplicate"})
+"""Error codes that will never change for a given token, so they are safe to cache."""
+
+
+def _token_key(token: str) -> bytes:
+    """Hash a token so the cache never holds raw token strings."""
+    return hashlib.sha256(token.encode("utf-8")).digest()
+
+
+class _NegativeCache:
+    """
+    Bounded TTL cache of failed responses for tokens that can never succeed.
+
+    Only responses whose error codes are all in `TERMINAL_ERROR_CODES` are
+    stored. Entries are evicted in least-recently-used order once `maxsize`
+    is reached.
+    """
+
+    def __init__(
+        self,
+        ttl: float,
+        maxsize: int,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """
+        Args:
+            ttl: How long, in seconds, a cached failure stays valid.
+            maxsize: Maximum number of cached tokens.
+            clock: Monotonic clock used for expiry, overridable for tests.
+        """
+        if ttl <= 0:
+            raise ValueError("ttl must be positive")
+        if maxsize <= 0:
+            raise ValueError("maxsize must be positive")
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._clock = clock
+        self._entries: OrderedDict[bytes, Tuple[float, TurnstileResponseDict]] = (
+            OrderedDict()
+        )
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._stores = 0
+        self._evictions = 0
+
+    @staticmethod
+    def is_cacheable(response: TurnstileResponse) -> bool:
+        """Return True if the response is a failure caused only by terminal error codes."""
+        return (
+            not response.success
+            and bool(response.error_codes)
+            and all(code in TERMINAL_ERROR_CODES for code in response.error_codes)
+        )
+
+    def get(self, token: str) -> Optional[TurnstileResponse]:
+        """Return a fresh copy of the cached failure for `token`, if any."""
+        key = _token_key(token)
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+            expires_at, data = entry
+            if expires_at <= now:
+                del self._entries[key]
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+        return TurnstileResponse(
+            {**data, "error_codes": list(data["error_codes"])}  # type: ignore
+        )
+
+    def put(self, token: str, response: TurnstileResponse) -> bool:
+        """
+        Cache `response` for `token` if it is a terminal failure.
+
+        Returns:
+            bool: Whether the response was stored.
+        """
+        if not self.is_cacheable(response):
+            return False
+        key = _token_key(token)
+        expires_at = self._clock() + self.ttl
+        with self._lock:
+            self._entries[key] = (expires_at, response.to_dict())
+            self._entries.move_to_end(key)
+            self._stores += 1
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+        return True
+
+    def clear(self) -> None:
+        """Remove all cached entries, keeping the counters."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> NegativeCacheStats:
+        """Return a snapshot of the cache counters."""
+        with self._lock:
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "stores": self._stores,
+                "evictions": self._evictions,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+            }
+
+
+__all__ = ["TERMINAL_ERROR_CODES"]
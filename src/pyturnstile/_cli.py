@@ -0,0 +1,320 @@
+"""The `pyturnstile` command: validate tokens in bulk from JSONL."""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import sys
+from typing import IO, Any, Dict, List, Optional, Tuple, Union
+
+import httpx
+
+from . import _core  # type: ignore
+from ._transports import AsyncHttpxTransport, AsyncTransport
+
+_READ_BATCH = 256
+"""Input lines read per call to the reader thread."""
+
+_RECORD_FIELDS = {
+    "remoteip": "expected_remoteip",
+    "expected_hostname": "expected_hostname",
+    "expected_action": "expected_action",
+    "idempotency_key": "idempotency_key",
+}
+"""Optional record fields, mapped to `async_validate` parameters."""
+
+_Result = Dict[str, Any]
+_Work = Tuple[int, str, Optional["asyncio.Future[_Result]"]]
+
+EPILOG = """\
+Each input line is a JSON object with a "token" and optionally "remoteip",
+"expected_hostname", "expected_action", "idempotency_key", "secret" (overrides
+--secret) and "id" (copied to the output). Each output line holds the input's
+"line" number and "id", then either the validation result or an "error".
+
+Exits with status 1 if any record could not be validated (invalid input or a
+request error); rejected tokens are not errors. Exits with status 2 if a record
+has no secret and neither --secret nor $TURNSTILE_SECRET is set.
+"""
+
+
+class _MissingSecret(ValueError):
+    """A record has no secret and no default secret was given."""
+
+
+class _RateLimiter:
+    """Space request starts evenly at `rate` per second."""
+
+    def __init__(self, rate: float) -> None:
+        self.interval = 1 / rate
+        self._next = 0.0
+
+    async def acquire(self) -> None:
+        now = asyncio.get_running_loop().time()
+        start = max(now, self._next)
+        self._next = start + self.interval
+        if start > now:
+            await asyncio.sleep(start - now)
+
+
+def _read_batch(source: IO[str]) -> List[str]:
+    return list(itertools.islice(source, _READ_BATCH))
+
+
+def _check_record(record: Any) -> None:
+    if not isinstance(record, dict) or not isinstance(record.get("token"), str):
+        raise ValueError('expected a JSON object with a "token" string')
+    for name in (*_RECORD_FIELDS, "secret"):
+        if not isinstance(record.get(name, ""), (str, type(None))):
+            raise ValueError(f'"{name}" must be a string')
+
+
+async def _validate_line(
+    number: int,
+    line: str,
+    *,
+    secret: Optional[str],
+    timeout: float,
+    url: str,
+    transport: AsyncTransport,
+    limiter: Optional[_RateLimiter],
+) -> _Result:
+    result: _Result = {"line": number}
+    try:
+        record = json.loads(line)
+        if isinstance(record, dict) and "id" in record:
+            result["id"] = record["id"]
+        _check_record(record)
+    except ValueError as e:
+        result["error"] = f"Invalid record: {e}"
+        return result
+    record_secret = record.get("secret") or secret
+    if not record_secret:
+        raise _MissingSecret(f'line {number} has no "secret" and no default was given')
+
+    if limiter is not None:
+        await limiter.acquire()
+    try:
+        response = await _core.async_validate(
+            record["token"],
+            record_secret,
+            timeout=timeout,  # type: ignore[arg-type]
+            transport=transport,
+            url=url,
+            **{param: record.get(name) for name, param in _RECORD_FIELDS.items()},
+        )
+    except _core.TurnstileValidationError as e:
+        result["error"] = str(e)
+        return result
+    result.update(response.to_dict())
+    return result
+
+
+async def validate_stream(
+    source: IO[str],
+    output: IO[str],
+    *,
+    secret: Optional[str] = None,
+    concurrency: int = 20,
+    rate_limit: Optional[float] = None,
+    timeout: float = 10,
+    url: str = _core.SITEVERIFY_URL,
+    ordered: bool = True,
+    transport: Optional[AsyncTransport] = None,
+) -> int:
+    """
+    Validate JSONL records from `source` and write one JSONL result per record to `output`.
+
+    At most `concurrency` requests are in flight and at most `4 * concurrency`
+    results wait to be written, so memory use does not grow with the input size.
+    Args:
+        source: Text stream of JSONL records.
+        output: Text stream the results are written to.
+        secret: (Optional) Secret for records that do not carry their own.
+        concurrency: (Optional) Maximum number of requests in flight.
+        rate_limit: (Optional) Maximum number of requests started per second.
+        timeout: (Optional) Timeout for each API request in seconds.
+        url: (Optional) The siteverify endpoint.
+        ordered: (Optional) Write results in input order instead of as they complete.
+        transport: (Optional) An async transport to send requests with. Not closed.
+            Defaults to a pooled `AsyncHttpxTransport` sized to `concurrency`.
+    Returns:
+        int: The number of records that could not be validated.
+    Raises:
+        ValueError: If `concurrency` or `rate_limit` is not positive, or if a record has
+            no secret and `secret` is not given. The run stops at that record.
+    """
+    if concurrency <= 0:
+        raise ValueError("concurrency must be positive")
+    if rate_limit is not None and rate_limit <= 0:
+        raise ValueError("rate_limit must be positive")
+
+    owned: Optional[AsyncHttpxTransport] = None
+    if transport is None:
+        transport = owned = AsyncHttpxTransport(
+            limits=httpx.Limits(
+                max_connections=concurrency, max_keepalive_connections=concurrency
+            )
+        )
+    limiter = _RateLimiter(rate_limit) if rate_limit is not None else None
+    loop = asyncio.get_running_loop()
+
+    work: asyncio.Queue[Optional[_Work]] = asyncio.Queue(maxsize=concurrency)
+    # In-order mode: futures in input order. As-completed mode: finished results.
+    # Either way, at most `4 * concurrency` entries are pending.
+    pending: asyncio.Queue[Union[asyncio.Future[_Result], _Result, None]] = (
+        asyncio.Queue(maxsize=4 * concurrency)
+    )
+    errors = 0
+
+    async def produce() -> None:
+        number = 0
+        while True:
+            batch = await loop.run_in_executor(None, _read_batch, source)
+            if not batch:
+                break
+            for line in batch:
+                number += 1
+                if not line.strip():
+                    continue
+                future: Optional[asyncio.Future[_Result]] = None
+                if ordered:
+                    future = loop.create_future()
+                    await pending.put(future)
+                await work.put((number, line, future))
+        for _ in range(concurrency):
+            await work.put(None)
+
+    async def consume() -> None:
+        while True:
+            item = await work.get()
+            if item is None:
+                return
+            number, line, future = item
+            result = await _validate_line(
+                number,
+                line,
+                secret=secret,
+                timeout=timeout,
+                url=url,
+                transport=transport,  # type: ignore[arg-type]
+                limiter=limiter,
+            )
+            if future is not None:
+                future.set_result(result)
+            else:
+                await pending.put(result)
+
+    async def write() -> None:
+        nonlocal errors
+        while True:
+            item = await pending.get()
+            if item is None:
+                return
+            result = await item if isinstance(item, asyncio.Future) else item
+            errors += "error" in result
+            output.write(json.dumps(result) + "\n")
+            if pending.empty():
+                output.flush()
+
+    tasks = [
+        asyncio.ensure_future(produce()),
+        *(asyncio.ensure_future(consume()) for _ in range(concurrency)),
+    ]
+    writer = asyncio.ensure_future(write())
+    try:
+        await asyncio.gather(*tasks)
+        await pending.put(None)
+        await writer
+    finally:
+        for task in (*tasks, writer):
+            task.cancel()
+        if owned is not None:
+            await owned.aclose()
+    output.flush()
+    return errors
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Entry point for the `pyturnstile` command."""
+    parser = argparse.ArgumentParser(
+        prog="pyturnstile",
+        description="Validate Cloudflare Turnstile tokens in bulk from JSONL.",
+        epilog=EPILOG,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument(
+        "input",
+        nargs="?",
+        default="-",
+        help="JSONL file to read, or - for stdin (default)",
+    )
+    parser.add_argument(
+        "-o", "--output", default="-", help="file to write, or - for stdout (default)"
+    )
+    parser.add_argument(
+        "--secret",
+        default=os.environ.get("TURNSTILE_SECRET"),
+        help="widget secret key (default: $TURNSTILE_SECRET)",
+    )
+    parser.add_argument(
+        "-c",
+        "--concurrency",
+        type=int,
+        default=20,
+        help="maximum requests in flight (default: 20)",
+    )
+    parser.add_argument(
+        "--rate-limit", type=float, default=None, help="maximum requests per second"
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=10,
+        help="timeout per request in seconds (default: 10)",
+    )
+    parser.add_argument(
+        "--url", default=_core.SITEVERIFY_URL, help="siteverify endpoint URL"
+    )
+    parser.add_argument(
+        "--unordered",
+        action="store_true",
+        help="write results as they complete instead of in input order",
+    )
+    args = parser.parse_args(argv)
+    if args.concurrency <= 0:
+        parser.error("--concurrency must be positive")
+    if args.rate_limit is not None and args.rate_limit <= 0:
+        parser.error("--rate-limit must be positive")
+
+    source = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+    output = (
+        sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    )
+    try:
+        errors = asyncio.run(
+            validate_stream(
+                source,
+                output,
+                secret=args.secret,
+                concurrency=args.concurrency,
+                rate_limit=args.rate_limit,
+                timeout=args.timeout,
+                url=args.url,
+                ordered=not args.unordered,
+            )
+        )
+    except _MissingSecret as e:
+        parser.error(f"{e} (use --secret or set $TURNSTILE_SECRET)")
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if output is not sys.stdout:
+            output.close()
+    sys.exit(1 if errors else 0)
+
+
+__all__ = ["main", "validate_stream"]
@@ -2,16 +2,69 @@
 
 from __future__ import annotations
 
-from typing import Optional
+import functools
+from typing import Dict, Optional
+from urllib.parse import quote_plus
 
 import httpx
 
+from ._transports import (
+    AsyncHttpxTransport,
+    AsyncTransport,
+    HttpxTransport,
+    Transport,
+)
 from ._types import (
     TurnstileResponse,
     TurnstileValidationError,
     _TurnstileResponseDictCF,  # type: ignore
 )
 
+SITEVERIFY_URL = "https://challenges.cloudflare.com/turnstile/v0/siteverify"
+"""Cloudflare's siteverify endpoint."""
+
+
+class _RequestTemplate:
+    """
+    The parts of a siteverify request that only depend on the secret, encoded once.
+
+    Building the form body by string concatenation avoids the per-call dict and
+    `urlencode` work that passing `data=` to httpx would repeat.
+    """
+
+    __slots__ = ("url", "headers", "_prefix")
+
+    def __init__(self, secret: str, url: str = SITEVERIFY_URL) -> None:
+        self.url = url
+        self.headers: Dict[str, str] = {
+            "Content-Type": "application/x-www-form-urlencoded"
+        }
+        self._prefix = "secret=" + quote_plus(secret) + "&response="
+
+    def encode(
+        self,
+        token: str,
+        remoteip: Optional[str] = None,
+        idempotency_key: Optional[str] = None,
+    ) -> bytes:
+        """Return the urlencoded form body for a single validation."""
+        body = self._prefix + quote_plus(token)
+        if remoteip:
+            body += "&remoteip=" + quote_plus(remoteip)
+        if idempotency_key:
+            body += "&idempotency_key=" + quote_plus(idempotency_key)
+        return body.encode("ascii")
+
+
+@functools.lru_cache(maxsize=64)
+def _request_template(secret: str, url: str = SITEVERIFY_URL) -> _RequestTemplate:
+    """
+    Return the shared request template for a secret and endpoint.
+
+    Only used by the module-level functions; `Turnstile` keeps its own template.
+    """
+    return _RequestTemplate(secret, url)
+
 
 def _additional_validation(
     response: _TurnstileResponseDictCF,
@@ -52,6 +105,10 @@ async def async_validate(
     expected_hostname: Optional[str] = None,
     expected_action: Optional[str] = None,
     timeout: int = 10,
+    client: Optional[httpx.AsyncClient] = None,
+    transport: Optional[AsyncTransport] = None,
+    url: str = SITEVERIFY_URL,
+    template: Optional[_RequestTemplate] = None,
 ) -> TurnstileResponse:
     """
     Asynchronously validate a Turnstile token with Cloudflare's API.
@@ -63,28 +120,30 @@ async def async_validate(
         expected_hostname: (Optional) The hostname that the challenge response must match.
         expected_action: (Optional) The action identifier that the challenge must match.
         timeout: (Optional) Timeout for the API request in seconds
+        client: (Optional) A shared HTTP client to send the request with. It is not closed afterwards.
+        transport: (Optional) A transport to send the request with instead of httpx. Takes precedence over `client`.
+        url: (Optional) The siteverify endpoint, e.g. a proxy or a local mock server.
+        template: (Optional) A request template already built for `secret`, used instead of `url`.
     Returns:
         TurnstileResponse: The response from the Turnstile API
 
     For more details on all available parameters, see the [Cloudflare documentation](https://developers.cloudflare.com/turnstile/get-started/server-side-validation/#required-parameters)
     """
-    url = "https://challenges.cloudflare.com/turnstile/v0/siteverify"
-
-    data = {"secret": secret, "response": token}
+    if template is None:
+        template = _request_template(secret, url)
+    content = template.encode(token, expected_remoteip, idempotency_key)
 
-    if expected_remoteip:
-        data["remoteip"] = expected_remoteip
-
-    if idempotency_key:
-        data["idempotency_key"] = idempotency_key
+    request = (template.url, content, template.headers, timeout)
 
     try:
-        async with httpx.AsyncClient(timeout=timeout) as client:
-            response = await client.post(url, data=data)
-            response.raise_for_status()
-            return _additional_validation(
-                response.json(), expected_hostname, expected_action
-            )
+        if transport is not None:
+            result = await transport.post(*request)
+        elif client is not None:
+            result = await AsyncHttpxTransport(client).post(*request)
+        else:
+            async with httpx.AsyncClient(timeout=timeout) as client:
+                result = await AsyncHttpxTransport(client).post(*request)
+        return _additional_validation(result, expected_hostname, expected_action)
     except Exception as e:
         raise TurnstileValidationError(f"Turnstile validation failed: {e}") from e
 
@@ -98,6 +157,10 @@ def validate(
     expected_hostname: Optional[str] = None,
     expected_action: Optional[str] = None,
     timeout: int = 10,
+    client: Optional[httpx.Client] = None,
+    transport: Optional[Transport] = None,
+    url: str = SITEVERIFY_URL,
+    template: Optional[_RequestTemplate] = None,
 ) -> TurnstileResponse:
     """
     Validate a Turnstile token with Cloudflare's API.
@@ -110,28 +173,30 @@ def validate(
         expected_hostname: (Optional) The hostname that the challenge response must match.
         expected_action: (Optional) The action identifier that the challenge must match.
         timeout: (Optional) Timeout for the API request in seconds
+        client: (Optional) A shared HTTP client to send the request with. It is not closed afterwards.
+        transport: (Optional) A transport to send the request with instead of httpx. Takes precedence over `client`.
+        url: (Optional) The siteverify endpoint, e.g. a proxy or a local mock server.
+        template: (Optional) A request template already built for `secret`, used instead of `url`.
     Returns:
         TurnstileResponse: The response from the Turnstile API
 
     For more details on all available parameters, see the [Cloudflare documentation](https://developers.cloudflare.com/turnstile/get-started/server-side-validation/#required-parameters)
     """
-    url = "https://challenges.cloudflare.com/turnstile/v0/siteverify"
-
-    data = {"secret": secret, "response": token}
-
-    if expected_remoteip:
-        data["remoteip"] = expected_remoteip
+    if template is None:
+        template = _request_template(secret, url)
+    content = template.encode(token, expected_remoteip, idempotency_key)
 
-    if idempotency_key:
-        data["idempotency_key"] = idempotency_key
+    request = (template.url, content, template.headers, timeout)
 
     try:
-        with httpx.Client(timeout=timeout) as client:
-            response = client.post(url, data=data)
-            response.raise_for_status()
-            return _additional_validation(
-                response.json(), expected_hostname, expected_action
-            )
+        if transport is not None:
+            result = transport.post(*request)
+        elif client is not None:
+            result = HttpxTransport(client).post(*request)
+        else:
+            with httpx.Client(timeout=timeout) as client:
+                result = HttpxTransport(client).post(*request)
+        return _additional_validation(result, expected_hostname, expected_action)
     except Exception as e:
         raise TurnstileValidationError(f"Turnstile validation failed: {e}") from e
 
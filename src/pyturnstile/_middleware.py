@@ -0,0 +1,408 @@
+"""ASGI and WSGI middleware that start token validation as soon as a request arrives."""
+
+from __future__ import annotations
+
+import asyncio
+import io
+import json
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Collection,
+    Dict,
+    Iterable,
+    List,
+    Mapping,
+    MutableMapping,
+    Optional,
+    Tuple,
+)
+from urllib.parse import parse_qs
+
+from ._turnstile import Turnstile
+from ._types import TurnstileResponse
+
+TOKEN_FIELD = "cf-turnstile-response"
+"""Form field (and header) the Turnstile widget submits its token in."""
+
+WSGI_ENVIRON_KEY = "pyturnstile.validation"
+"""WSGI environ key holding the pending validation `Future`."""
+
+ASGI_STATE_KEY = "turnstile"
+"""Key in the ASGI `scope["state"]` holding the pending validation task."""
+
+MAX_BODY_SIZE = 64 * 1024
+"""Default limit on the request body buffered to look for the token, in bytes."""
+
+Scope = MutableMapping[str, Any]
+Message = MutableMapping[str, Any]
+Receive = Callable[[], Awaitable[Message]]
+Send = Callable[[Message], Awaitable[None]]
+ASGIApp = Callable[[Scope, Receive, Send], Awaitable[None]]
+
+
+def _missing_token_response() -> TurnstileResponse:
+    """The response Cloudflare gives for an empty token, without calling the API."""
+    return TurnstileResponse(
+        {"success": False, "error-codes": ["missing-input-response"]}  # type: ignore
+    )
+
+
+def _extract_token(
+    headers: Mapping[str, str], body: bytes, field: str
+) -> Optional[str]:
+    """
+    Find the Turnstile token in a request.
+
+    The token is read from a header named like `field`, a urlencoded form field
+    or a top-level JSON key, in that order. Multipart bodies are not parsed.
+    Args:
+        headers: Request headers with lowercase names.
+        body: The raw request body.
+        field: The form field / header / JSON key holding the token.
+    """
+    token = headers.get(field)
+    if token:
+        return token
+
+    content_type = headers.get("content-type", "").split(";", 1)[0].strip().lower()
+    try:
+        if content_type == "application/x-www-form-urlencoded":
+            values = parse_qs(body.decode("latin-1")).get(field)
+            return values[0] if values else None
+        if content_type == "application/json":
+            data = json.loads(body)
+            token = data.get(field) if isinstance(data, dict) else None
+            return token if isinstance(token, str) else None
+    except ValueError:
+        return None
+    return None
+
+
+class _Options:
+    """Route matching and validation options shared by both middlewares."""
+
+    def __init__(
+        self,
+        paths: Optional[Mapping[str, Optional[str]]],
+        methods: Collection[str],
+        field: str,
+        remoteip_header: Optional[str],
+        expected_hostname: Optional[str],
+        max_body_size: int,
+    ) -> None:
+        if max_body_size < 0:
+            raise ValueError("max_body_size must not be negative")
+        self.paths = dict(paths) if paths is not None else None
+        self.methods = frozenset(method.upper() for method in methods)
+        self.field = field.lower()
+        self.remoteip_header = remoteip_header.lower() if remoteip_header else None
+        self.expected_hostname = expected_hostname
+        self.max_body_size = max_body_size
+
+    def match(self, method: str, path: str) -> Tuple[bool, Optional[str]]:
+        """Return whether to validate the request, and its expected action."""
+        if method.upper() not in self.methods:
+            return False, None
+        if self.paths is None:
+            return True, None
+        if path not in self.paths:
+            return False, None
+        return True, self.paths[path]
+
+    def body_too_large(self, content_length: Optional[str]) -> bool:
+        """Whether a declared Content-Length exceeds `max_body_size`."""
+        try:
+            return int(content_length or 0) > self.max_body_size
+        except ValueError:
+            return False
+
+    def remoteip(
+        self, headers: Mapping[str, str], peer: Optional[str]
+    ) -> Optional[str]:
+        if self.remoteip_header:
+            return headers.get(self.remoteip_header) or peer
+        return peer
+
+
+class TurnstileMiddleware:
+    """
+    ASGI middleware that starts validating the Turnstile token before the app runs.
+
+    For matching requests, the body (up to `max_body_size`) is read, the token
+    is extracted and `Turnstile.async_validate` is started as a task. The app
+    receives the request unchanged and can await the task from `scope["state"]["turnstile"]`
+    (`request.state.turnstile` in Starlette/FastAPI) only when it needs the result,
+    doing independent work in the meantime. Unfinished tasks are cancelled once
+    the app returns.
+
+    Example:
+        >>> turnstile = Turnstile(secret="your-secret-key")
+        >>> app.add_middleware(
+        ...     TurnstileMiddleware,
+        ...     turnstile=turnstile,
+        ...     paths={"/login": "login", "/signup": "signup"},
+        ... )
+        >>> @app.post("/login")
+        ... async def login(request: Request):
+        ...     user = await load_user(...)
+        ...     if not await request.state.turnstile:
+        ...         raise HTTPException(403)
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        turnstile: Turnstile,
+        *,
+        paths: Optional[Mapping[str, Optional[str]]] = None,
+        methods: Collection[str] = ("POST",),
+        field: str = TOKEN_FIELD,
+        remoteip_header: Optional[str] = None,
+        expected_hostname: Optional[str] = None,
+        max_body_size: int = MAX_BODY_SIZE,
+        warmup_connections: int = 0,
+        timeout: int = 10,
+    ):
+        """
+        Args:
+            app: The ASGI application to wrap.
+            turnstile: The client to validate with, shared by every request in the process.
+            paths: (Optional) Exact request paths to validate, mapped to the action their tokens
+                must match (or None for any action). All paths are validated when omitted.
+            methods: (Optional) HTTP methods to validate.
+            field: (Optional) Form field, JSON key or header holding the token.
+            remoteip_header: (Optional) Header carrying the visitor's IP (e.g. "CF-Connecting-IP"),
+                only safe when set by a trusted proxy. The socket peer address is used otherwise.
+            expected_hostname: (Optional) The hostname every token must match.
+            max_body_size: (Optional) Largest body, in bytes, buffered to look for the token.
+                Larger bodies are passed through unread and only the header is checked.
+            warmup_connections: (Optional) Connections to open with `Turnstile.async_warmup`
+                during ASGI lifespan startup.
+            timeout: (Optional) Timeout for each API request in seconds.
+        """
+        self.app = app
+        self.turnstile = turnstile
+        self.warmup_connections = warmup_connections
+        self.timeout = timeout
+        self._options = _Options(
+            paths, methods, field, remoteip_header, expected_hostname, max_body_size
+        )
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "lifespan" and self.warmup_connections:
+            await self.app(scope, self._warmup_on_startup(receive), send)
+            return
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        should_validate, action = self._options.match(scope["method"], scope["path"])
+        if not should_validate:
+            await self.app(scope, receive, send)
+            return
+
+        headers = {
+            key.decode("latin-1").lower(): value.decode("latin-1")
+            for key, value in scope.get("headers", [])
+        }
+        messages: List[Message] = []
+        body = b""
+        if not self._options.body_too_large(headers.get("content-length")):
+            messages, body = await self._read_body(receive, self._options.max_body_size)
+        client = scope.get("client")
+        task = self._start_validation(
+            _extract_token(headers, body, self._options.field),
+            self._options.remoteip(headers, client[0] if client else None),
+            action,
+        )
+        scope.setdefault("state", {})[ASGI_STATE_KEY] = task
+
+        async def replay() -> Message:
+            if messages:
+                return messages.pop(0)
+            return await receive()
+
+        try:
+            await self.app(scope, replay, send)
+        finally:
+            if not task.done():
+                task.cancel()
+
+    def _warmup_on_startup(self, receive: Receive) -> Receive:
+        async def wrapped() -> Message:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await self.turnstile.async_warmup(self.warmup_connections)
+            return message
+
+        return wrapped
+
+    @staticmethod
+    async def _read_body(receive: Receive, limit: int) -> Tuple[List[Message], bytes]:
+        """
+        Read the request body, keeping the messages to replay to the app.
+
+        Reading stops once more than `limit` bytes arrived; the body is then
+        returned empty and the app receives the rest from the server directly.
+        """
+        messages: List[Message] = []
+        chunks: List[bytes] = []
+        size = 0
+        while True:
+            message = await receive()
+            messages.append(message)
+            if message["type"] != "http.request":
+                break
+            chunk = message.get("body", b"")
+            size += len(chunk)
+            if size > limit:
+                return messages, b""
+            chunks.append(chunk)
+            if not message.get("more_body", False):
+                break
+        return messages, b"".join(chunks)
+
+    def _start_validation(
+        self, token: Optional[str], remoteip: Optional[str], action: Optional[str]
+    ) -> asyncio.Future[TurnstileResponse]:
+        if not token:
+            future: asyncio.Future[TurnstileResponse] = (
+                asyncio.get_running_loop().create_future()
+            )
+            future.set_result(_missing_token_response())
+            return future
+
+        self.turnstile._pooled_async_transport()
+        task = asyncio.ensure_future(
+            self.turnstile.async_validate(
+                token,
+                expected_remoteip=remoteip,
+                expected_hostname=self._options.expected_hostname,
+                expected_action=action,
+                timeout=self.timeout,
+            )
+        )
+        # Avoid "exception was never retrieved" warnings when the app does not await it.
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        return task
+
+
+class TurnstileWSGIMiddleware:
+    """
+    WSGI middleware that starts validating the Turnstile token before the app runs.
+
+    For matching requests, the body (up to `max_body_size`) is read and replaced
+    with an in-memory copy, and `Turnstile.validate` is submitted to a thread pool. The app can call
+    `environ["pyturnstile.validation"].result()` only when it needs the result.
+
+    Example:
+        >>> app.wsgi_app = TurnstileWSGIMiddleware(
+        ...     app.wsgi_app, Turnstile(secret="your-secret-key"), paths={"/login": "login"}
+        ... )
+        >>> @app.post("/login")
+        ... def login():
+        ...     user = load_user(...)
+        ...     if not request.environ["pyturnstile.validation"].result():
+        ...         abort(403)
+    """
+
+    def __init__(
+        self,
+        app: Callable[..., Iterable[bytes]],
+        turnstile: Turnstile,
+        *,
+        paths: Optional[Mapping[str, Optional[str]]] = None,
+        methods: Collection[str] = ("POST",),
+        field: str = TOKEN_FIELD,
+        remoteip_header: Optional[str] = None,
+        expected_hostname: Optional[str] = None,
+        max_body_size: int = MAX_BODY_SIZE,
+        max_workers: int = 32,
+        timeout: int = 10,
+    ):
+        """
+        Args:
+            app: The WSGI application to wrap.
+            turnstile: The client to validate with, shared by every request in the process.
+            paths: (Optional) Exact request paths to validate, mapped to the action their tokens
+                must match (or None for any action). All paths are validated when omitted.
+            methods: (Optional) HTTP methods to validate.
+            field: (Optional) Form field, JSON key or header holding the token.
+            remoteip_header: (Optional) Header carrying the visitor's IP (e.g. "CF-Connecting-IP"),
+                only safe when set by a trusted proxy. REMOTE_ADDR is used otherwise.
+            expected_hostname: (Optional) The hostname every token must match.
+            max_body_size: (Optional) Largest body, in bytes, buffered to look for the token.
+                Larger bodies are passed through unread and only the header is checked.
+            max_workers: (Optional) Size of the thread pool running validations.
+            timeout: (Optional) Timeout for each API request in seconds.
+        """
+        self.app = app
+        self.turnstile = turnstile
+        self.timeout = timeout
+        self._options = _Options(
+            paths, methods, field, remoteip_header, expected_hostname, max_body_size
+        )
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="pyturnstile"
+        )
+
+    def __call__(
+        self, environ: Dict[str, Any], start_response: Callable[..., Any]
+    ) -> Iterable[bytes]:
+        should_validate, action = self._options.match(
+            environ.get("REQUEST_METHOD", "GET"), environ.get("PATH_INFO", "")
+        )
+        if should_validate:
+            body = self._read_body(environ)
+            headers = {
+                key[5:].replace("_", "-").lower(): value
+                for key, value in environ.items()
+                if key.startswith("HTTP_")
+            }
+            headers["content-type"] = environ.get("CONTENT_TYPE", "")
+            environ[WSGI_ENVIRON_KEY] = self._start_validation(
+                _extract_token(headers, body, self._options.field),
+                self._options.remoteip(headers, environ.get("REMOTE_ADDR")),
+                action,
+            )
+        return self.app(environ, start_response)
+
+    def _read_body(self, environ: Dict[str, Any]) -> bytes:
+        """Read the request body and put an in-memory copy back for the app."""
+        try:
+            length = int(environ.get("CONTENT_LENGTH") or 0)
+        except ValueError:
+            length = 0
+        if length > self._options.max_body_size:
+            return b""
+        body = environ["wsgi.input"].read(length) if length > 0 else b""
+        environ["wsgi.input"] = io.BytesIO(body)
+        return body
+
+    def _start_validation(
+        self, token: Optional[str], remoteip: Optional[str], action: Optional[str]
+    ) -> Future[TurnstileResponse]:
+        if not token:
+            future: Future[TurnstileResponse] = Future()
+            future.set_result(_missing_token_response())
+            return future
+
+        self.turnstile._pooled_transport()
+        return self._executor.submit(
+            self.turnstile.validate,
+            token,
+            expected_remoteip=remoteip,
+            expected_hostname=self._options.expected_hostname,
+            expected_action=action,
+            timeout=self.timeout,
+        )
+
+    def close(self) -> None:
+        """Shut down the validation thread pool."""
+        self._executor.shutdown(wait=False)
+
+
+__all__ = ["TurnstileMiddleware", "TurnstileWSGIMiddleware"]
@@ -0,0 +1,227 @@
+"""Registry of Turnstile clients for many widgets sharing one connection pool."""
+
+from __future__ import annotations
+
+from typing import Dict, Iterator, Optional
+
+import httpx
+
+from ._transports import (
+    AsyncHttpxTransport,
+    AsyncTransport,
+    HttpxTransport,
+    Transport,
+)
+from ._turnstile import Turnstile
+from ._types import TurnstileResponse
+
+
+class _Tenant:
+    """A registered widget: its client and default validation policy."""
+
+    __slots__ = ("turnstile", "expected_hostname", "expected_action")
+
+    def __init__(
+        self,
+        turnstile: Turnstile,
+        expected_hostname: Optional[str],
+        expected_action: Optional[str],
+    ) -> None:
+        self.turnstile = turnstile
+        self.expected_hostname = expected_hostname
+        self.expected_action = expected_action
+
+
+class TurnstileRegistry:
+    """
+    Validate tokens for many Turnstile widgets over a single shared connection pool.
+
+    Each tenant (usually a sitekey) is registered with its own secret and an
+    optional default hostname/action policy. All tenants send their requests
+    through the same `httpx.Client` and `httpx.AsyncClient`, or the same
+    custom transports.
+
+    Example:
+        >>> registry = TurnstileRegistry()
+        >>> registry.register("shop", secret="shop-secret", expected_hostname="shop.example.com")
+        >>> registry.register("blog", secret="blog-secret")
+        >>> response = await registry.async_validate("shop", token="user-token")
+
+        Rotating a secret without rebuilding clients:
+        >>> registry.rotate_secret("shop", "new-shop-secret", grace_period=3600)
+    """
+
+    def __init__(
+        self,
+        *,
+        client: Optional[httpx.Client] = None,
+        async_client: Optional[httpx.AsyncClient] = None,
+        limits: Optional[httpx.Limits] = None,
+        transport: Optional[Transport] = None,
+        async_transport: Optional[AsyncTransport] = None,
+    ):
+        """
+        Initialize the registry and its shared HTTP clients.
+        Args:
+            client: (Optional) An existing `httpx.Client` to share. Not closed by the registry.
+            async_client: (Optional) An existing `httpx.AsyncClient` to share. Not closed by the registry.
+            limits: (Optional) Connection pool limits for the clients created by the registry.
+            transport: (Optional) A sync transport to share instead of `client`. Not closed by the registry.
+            async_transport: (Optional) An async transport to share instead of `async_client`.
+                Not closed by the registry.
+        """
+        self._owns_transport = transport is None
+        self._owns_async_transport = async_transport is None
+        self._transport: Transport = transport or HttpxTransport(client, limits=limits)
+        self._async_transport: AsyncTransport = async_transport or AsyncHttpxTransport(
+            async_client, limits=limits
+        )
+        self._tenants: Dict[str, _Tenant] = {}
+
+    def register(
+        self,
+        tenant_id: str,
+        secret: str,
+        *,
+        expected_hostname: Optional[str] = None,
+        expected_action: Optional[str] = None,
+        negative_cache_ttl: Optional[float] = None,
+        negative_cache_size: int = 10_000,
+    ) -> Turnstile:
+        """
+        Register a widget, replacing any existing tenant with the same ID.
+        Args:
+            tenant_id: An identifier for the widget, such as its sitekey.
+            secret: The widget's secret key from the Cloudflare dashboard.
+            expected_hostname: (Optional) Default hostname every token for this tenant must match.
+            expected_action: (Optional) Default action every token for this tenant must match.
+            negative_cache_ttl: (Optional) See `Turnstile`.
+            negative_cache_size: (Optional) See `Turnstile`.
+        Returns:
+            Turnstile: The tenant's client, sharing the registry's connection pool.
+        """
+        turnstile = Turnstile(
+            secret,
+            negative_cache_ttl=negative_cache_ttl,
+            negative_cache_size=negative_cache_size,
+            transport=self._transport,
+            async_transport=self._async_transport,
+        )
+        self._tenants[tenant_id] = _Tenant(
+            turnstile, expected_hostname, expected_action
+        )
+        return turnstile
+
+    def unregister(self, tenant_id: str) -> None:
+        """Remove a tenant. Raises KeyError if it is not registered."""
+        del self._tenants[tenant_id]
+
+    def rotate_secret(
+        self, tenant_id: str, new_secret: str, *, grace_period: float = 7200
+    ) -> None:
+        """
+        Switch a tenant to a new secret while still accepting the old one.
+        Args:
+            tenant_id: The tenant to rotate.
+            new_secret: The new secret key from the Cloudflare dashboard.
+            grace_period: (Optional) Seconds during which the previous secret is still tried.
+        """
+        self[tenant_id].rotate_secret(new_secret, grace_period=grace_period)
+
+    def __getitem__(self, tenant_id: str) -> Turnstile:
+        return self._tenants[tenant_id].turnstile
+
+    def __contains__(self, tenant_id: object) -> bool:
+        return tenant_id in self._tenants
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(list(self._tenants))
+
+    def __len__(self) -> int:
+        return len(self._tenants)
+
+    def validate(
+        self,
+        tenant_id: str,
+        token: str,
+        *,
+        idempotency_key: Optional[str] = None,
+        expected_remoteip: Optional[str] = None,
+        expected_hostname: Optional[str] = None,
+        expected_action: Optional[str] = None,
+        timeout: int = 10,
+    ) -> TurnstileResponse:
+        """
+        Validate a token for the given tenant.
+
+        `expected_hostname` and `expected_action` override the tenant's defaults.
+        See `Turnstile.validate` for the other parameters.
+        Raises:
+            KeyError: If the tenant is not registered.
+            TurnstileValidationError: If the validation fails due to an API error or network issue
+        """
+        tenant = self._tenants[tenant_id]
+        return tenant.turnstile.validate(
+            token,
+            idempotency_key=idempotency_key,
+            expected_remoteip=expected_remoteip,
+            expected_hostname=expected_hostname or tenant.expected_hostname,
+            expected_action=expected_action or tenant.expected_action,
+            timeout=timeout,
+        )
+
+    async def async_validate(
+        self,
+        tenant_id: str,
+        token: str,
+        *,
+        idempotency_key: Optional[str] = None,
+        expected_remoteip: Optional[str] = None,
+        expected_hostname: Optional[str] = None,
+        expected_action: Optional[str] = None,
+        timeout: int = 10,
+    ) -> TurnstileResponse:
+        """
+        Asynchronously validate a token for the given tenant.
+
+        `expected_hostname` and `expected_action` override the tenant's defaults.
+        See `Turnstile.async_validate` for the other parameters.
+        Raises:
+            KeyError: If the tenant is not registered.
+            TurnstileValidationError: If the validation fails due to an API error or network issue
+        """
+        tenant = self._tenants[tenant_id]
+        return await tenant.turnstile.async_validate(
+            token,
+            idempotency_key=idempotency_key,
+            expected_remoteip=expected_remoteip,
+            expected_hostname=expected_hostname or tenant.expected_hostname,
+            expected_action=expected_action or tenant.expected_action,
+            timeout=timeout,
+        )
+
+    def close(self) -> None:
+        """Close the sync transport if the registry created it."""
+        if self._owns_transport:
+            self._transport.close()
+
+    async def aclose(self) -> None:
+        """Close both transports if the registry created them."""
+        self.close()
+        if self._owns_async_transport:
+            await self._async_transport.aclose()
+
+    def __enter__(self) -> TurnstileRegistry:
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        self.close()
+
+    async def __aenter__(self) -> TurnstileRegistry:
+        return self
+
+    async def __aexit__(self, *args: object) -> None:
+        await self.aclose()
+
+
+__all__ = ["TurnstileRegistry"]
@@ -0,0 +1,401 @@
+"""Framed protocol and client transports for the `pyturnstile.daemon` sidecar."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import select
+import socket
+import struct
+import threading
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+from ._transports import AsyncHttpxTransport, AsyncTransport, HttpxTransport, Transport
+from ._types import _TurnstileResponseDictCF  # type: ignore
+
+# Every frame is a 4-byte big-endian payload length followed by the payload.
+#
+# Request payloads start with a type byte:
+#   VALIDATE: type, pid (uint32), timeout (float64), url length (uint16), url, form body
+#   STATS:    type
+# Response payloads start with a status byte followed by the body:
+#   OK:    the JSON body returned by siteverify (or the stats JSON)
+#   ERROR: a UTF-8 error message
+_LENGTH = struct.Struct(">I")
+_VALIDATE_HEADER = struct.Struct(">BIdH")
+
+MSG_VALIDATE = 1
+MSG_STATS = 2
+STATUS_OK = 0
+STATUS_ERROR = 1
+
+MAX_FRAME_SIZE = 1 << 20
+"""Largest accepted frame payload, in bytes."""
+
+UNIX_SCHEME = "unix://"
+
+_Connection = Tuple[asyncio.StreamReader, asyncio.StreamWriter]
+
+
+def parse_unix_url(url: str) -> str:
+    """Return the socket path of a `unix:///path/to.sock` URL."""
+    if not url.startswith(UNIX_SCHEME):
+        raise ValueError(f"Unsupported transport URL: {url!r}")
+    path = url[len(UNIX_SCHEME) :]
+    if not path:
+        raise ValueError(f"Missing socket path in {url!r}")
+    return path
+
+
+def frame(payload: bytes) -> bytes:
+    """Prefix a payload with its length."""
+    return _LENGTH.pack(len(payload)) + payload
+
+
+def encode_validate(url: str, content: bytes, timeout: float) -> bytes:
+    """Build a framed VALIDATE request."""
+    raw_url = url.encode("utf-8")
+    header = _VALIDATE_HEADER.pack(MSG_VALIDATE, os.getpid(), timeout, len(raw_url))
+    return frame(header + raw_url + content)
+
+
+def decode_validate(payload: bytes) -> Tuple[int, float, str, bytes]:
+    """Split a VALIDATE payload into pid, timeout, url and form body."""
+    _, pid, timeout, url_length = _VALIDATE_HEADER.unpack_from(payload)
+    start = _VALIDATE_HEADER.size
+    url = payload[start : start + url_length].decode("utf-8")
+    return pid, timeout, url, payload[start + url_length :]
+
+
+def decode_response(payload: bytes) -> Any:
+    """Return the decoded JSON body of a response, raising on daemon errors."""
+    if not payload:
+        raise ConnectionError("Empty response from pyturnstile daemon")
+    if payload[0] != STATUS_OK:
+        raise RuntimeError(payload[1:].decode("utf-8", "replace"))
+    return json.loads(payload[1:])
+
+
+class _NotSent(ConnectionError):
+    """Sending failed, so the daemon cannot have read the whole request."""
+
+
+def _readable(fd: int) -> bool:
+    """Return whether a read on `fd` would not block (data or EOF is waiting)."""
+    if hasattr(select, "poll"):
+        poller = select.poll()
+        poller.register(fd, select.POLLIN)
+        return bool(poller.poll(0))
+    return bool(select.select([fd], [], [], 0)[0])
+
+
+def _recv_exact(sock: socket.socket, size: int) -> bytes:
+    chunks: List[bytes] = []
+    while size:
+        chunk = sock.recv(size)
+        if not chunk:
+            raise ConnectionError("pyturnstile daemon closed the connection")
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+class UnixSocketTransport:
+    """
+    Synchronous transport that validates through a `pyturnstile.daemon` sidecar.
+
+    Connections to the daemon are pooled, and checked before reuse. If the daemon
+    cannot be reached, or sending the request fails, the request is sent directly to
+    Cloudflare with `fallback` instead. Once a request has been sent it is never
+    retried, even if the daemon closes the connection without answering, so a token
+    is not validated twice.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        *,
+        fallback: Optional[Transport] = None,
+        max_idle_connections: int = 8,
+    ) -> None:
+        """
+        Args:
+            path: Path of the daemon's Unix socket.
+            fallback: (Optional) Transport used when the daemon is down. Defaults to a
+                pooled `HttpxTransport` created on first use.
+            max_idle_connections: (Optional) Maximum number of idle daemon connections kept open.
+        """
+        self.path = path
+        self.max_idle_connections = max_idle_connections
+        self._fallback = fallback
+        self._owns_fallback = fallback is None
+        self._idle: List[socket.socket] = []
+        self._lock = threading.Lock()
+
+    def _checkout(self) -> Optional[socket.socket]:
+        """Return a live pooled connection, or None."""
+        with self._lock:
+            sock = self._idle.pop() if self._idle else None
+        if sock is not None and _readable(sock.fileno()):
+            # The daemon never writes to an idle connection, so it was closed, most
+            # likely by a restart that closed the other idle connections as well.
+            sock.close()
+            self._drop_idle()
+            return None
+        return sock
+
+    def _open(self) -> socket.socket:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(self.path)
+        except OSError:
+            sock.close()
+            raise
+        return sock
+
+    def _release(self, sock: socket.socket) -> None:
+        with self._lock:
+            if len(self._idle) < self.max_idle_connections:
+                self._idle.append(sock)
+                return
+        sock.close()
+
+    def _drop_idle(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for sock in idle:
+            sock.close()
+
+    def _exchange(self, sock: socket.socket, request: bytes, timeout: float) -> bytes:
+        """
+        Send one framed request on `sock` and return the response payload.
+
+        Raises `_NotSent` if the send fails. Failures after the request was sent
+        are raised as they are, since the daemon may already be validating it.
+        """
+        try:
+            sock.settimeout(timeout)
+            try:
+                sock.sendall(request)
+            except socket.timeout:
+                raise
+            except OSError as e:
+                raise _NotSent(str(e)) from e
+            (size,) = _LENGTH.unpack(_recv_exact(sock, _LENGTH.size))
+            payload = _recv_exact(sock, size)
+        except BaseException:
+            sock.close()
+            raise
+        self._release(sock)
+        return payload
+
+    def _send(self, request: bytes, timeout: float) -> Optional[bytes]:
+        """
+        Send a framed request over a pooled or fresh connection.
+
+        If sending on a pooled connection fails, the idle connections are dropped
+        and the request is sent once more on a fresh connection.
+        Returns:
+            The response payload, or None if the daemon is not reachable.
+        """
+        sock = self._checkout()
+        if sock is not None:
+            try:
+                return self._exchange(sock, request, timeout)
+            except _NotSent:
+                self._drop_idle()
+        try:
+            sock = self._open()
+        except OSError:
+            return None
+        try:
+            return self._exchange(sock, request, timeout)
+        except _NotSent:
+            return None
+
+    def _fallback_transport(self) -> Transport:
+        if self._fallback is None:
+            self._fallback = HttpxTransport()
+        return self._fallback
+
+    def post(
+        self,
+        url: str,
+        content: bytes,
+        headers: Mapping[str, str],
+        timeout: float,
+    ) -> _TurnstileResponseDictCF:
+        payload = self._send(encode_validate(url, content, timeout), timeout)
+        if payload is None:
+            return self._fallback_transport().post(url, content, headers, timeout)
+        return decode_response(payload)
+
+    def warmup(self, url: str, connections: int, timeout: float) -> int:
+        """Open idle connections to the daemon, or warm the fallback if it is down."""
+        socks: List[socket.socket] = []
+        try:
+            for _ in range(connections):
+                socks.append(self._checkout() or self._open())
+        except OSError:
+            if not socks:
+                return self._fallback_transport().warmup(url, connections, timeout)  # type: ignore
+        finally:
+            for sock in socks:
+                self._release(sock)
+        return len(socks)
+
+    def stats(self, timeout: float = 5) -> Dict[str, Any]:
+        """Return the daemon's statistics."""
+        payload = self._send(frame(bytes([MSG_STATS])), timeout)
+        if payload is None:
+            raise ConnectionError(f"pyturnstile daemon is not running on {self.path}")
+        return decode_response(payload)
+
+    def close(self) -> None:
+        self._drop_idle()
+        if self._owns_fallback and self._fallback is not None:
+            self._fallback.close()
+
+
+class AsyncUnixSocketTransport:
+    """Asynchronous version of `UnixSocketTransport`."""
+
+    def __init__(
+        self,
+        path: str,
+        *,
+        fallback: Optional[AsyncTransport] = None,
+        max_idle_connections: int = 8,
+    ) -> None:
+        """
+        Args:
+            path: Path of the daemon's Unix socket.
+            fallback: (Optional) Transport used when the daemon is down. Defaults to a
+                pooled `AsyncHttpxTransport` created on first use.
+            max_idle_connections: (Optional) Maximum number of idle daemon connections kept open.
+        """
+        self.path = path
+        self.max_idle_connections = max_idle_connections
+        self._fallback = fallback
+        self._owns_fallback = fallback is None
+        self._idle: List[_Connection] = []
+
+    def _checkout(self) -> Optional[_Connection]:
+        """Async version of `UnixSocketTransport._checkout`."""
+        if not self._idle:
+            return None
+        reader, writer = conn = self._idle.pop()
+        if (
+            writer.is_closing()
+            or reader.at_eof()
+            or _readable(writer.get_extra_info("socket").fileno())
+        ):
+            writer.close()
+            self._drop_idle()
+            return None
+        return conn
+
+    def _release(self, conn: _Connection) -> None:
+        if len(self._idle) < self.max_idle_connections:
+            self._idle.append(conn)
+        else:
+            conn[1].close()
+
+    def _drop_idle(self) -> None:
+        idle, self._idle = self._idle, []
+        for _, writer in idle:
+            writer.close()
+
+    async def _exchange(
+        self, conn: _Connection, request: bytes, timeout: float
+    ) -> bytes:
+        """Async version of `UnixSocketTransport._exchange`."""
+        reader, writer = conn
+
+        async def exchange() -> bytes:
+            try:
+                writer.write(request)
+                await writer.drain()
+            except ConnectionError as e:
+                raise _NotSent(str(e)) from e
+            try:
+                (size,) = _LENGTH.unpack(await reader.readexactly(_LENGTH.size))
+                return await reader.readexactly(size)
+            except asyncio.IncompleteReadError as e:
+                raise ConnectionError("pyturnstile daemon closed the connection") from e
+
+        try:
+            payload = await asyncio.wait_for(exchange(), timeout)
+        except BaseException:
+            writer.close()
+            raise
+        self._release(conn)
+        return payload
+
+    async def _send(self, request: bytes, timeout: float) -> Optional[bytes]:
+        """Async version of `UnixSocketTransport._send`."""
+        conn = self._checkout()
+        if conn is not None:
+            try:
+                return await self._exchange(conn, request, timeout)
+            except _NotSent:
+                self._drop_idle()
+        try:
+            conn = await asyncio.open_unix_connection(self.path)
+        except OSError:
+            return None
+        try:
+            return await self._exchange(conn, request, timeout)
+        except _NotSent:
+            return None
+
+    def _fallback_transport(self) -> AsyncTransport:
+        if self._fallback is None:
+            self._fallback = AsyncHttpxTransport()
+        return self._fallback
+
+    async def post(
+        self,
+        url: str,
+        content: bytes,
+        headers: Mapping[str, str],
+        timeout: float,
+    ) -> _TurnstileResponseDictCF:
+        payload = await self._send(encode_validate(url, content, timeout), timeout)
+        if payload is None:
+            return await self._fallback_transport().post(url, content, headers, timeout)
+        return decode_response(payload)
+
+    async def warmup(self, url: str, connections: int, timeout: float) -> int:
+        """Open idle connections to the daemon, or warm the fallback if it is down."""
+        conns: List[_Connection] = []
+        try:
+            for _ in range(connections):
+                conns.append(
+                    self._checkout() or await asyncio.open_unix_connection(self.path)
+                )
+        except OSError:
+            if not conns:
+                return await self._fallback_transport().warmup(  # type: ignore
+                    url, connections, timeout
+                )
+        finally:
+            for conn in conns:
+                self._release(conn)
+        return len(conns)
+
+    async def stats(self, timeout: float = 5) -> Dict[str, Any]:
+        """Return the daemon's statistics."""
+        payload = await self._send(frame(bytes([MSG_STATS])), timeout)
+        if payload is None:
+            raise ConnectionError(f"pyturnstile daemon is not running on {self.path}")
+        return decode_response(payload)
+
+    async def aclose(self) -> None:
+        self._drop_idle()
+        if self._owns_fallback and self._fallback is not None:
+            await self._fallback.aclose()
+
+
+__all__ = ["UnixSocketTransport", "AsyncUnixSocketTransport"]
@@ -0,0 +1,586 @@
+"""Pluggable HTTP transports used to send siteverify requests."""
+
+from __future__ import annotations
+
+import asyncio
+import functools
+import importlib.util
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    List,
+    Mapping,
+    Optional,
+    Protocol,
+    Sequence,
+    Union,
+)
+from urllib.parse import parse_qsl
+
+import httpx
+
+from ._types import _TurnstileResponseDictCF  # type: ignore
+
+if TYPE_CHECKING:
+    import aiohttp
+    import urllib3
+
+
+class Transport(Protocol):
+    """
+    A synchronous transport that POSTs a pre-encoded form to siteverify.
+
+    Implementations must raise on connection errors and non-2xx responses,
+    and return the decoded JSON body.
+
+    Transports may also implement `warmup(url, connections, timeout) -> int`,
+    opening up to `connections` pooled connections to the host of `url` and
+    returning how many succeeded. It is used by `Turnstile.warmup`.
+    """
+
+    def post(
+        self,
+        url: str,
+        content: bytes,
+        headers: Mapping[str, str],
+        timeout: float,
+    ) -> _TurnstileResponseDictCF:
+        """Send the request and return the decoded JSON response."""
+        ...
+
+    def close(self) -> None:
+        """Release any connections owned by the transport."""
+        ...
+
+
+class AsyncTransport(Protocol):
+    """
+    The asynchronous counterpart of `Transport`.
+
+    The optional `warmup` method is a coroutine, used by `Turnstile.async_warmup`.
+    """
+
+    async def post(
+        self,
+        url: str,
+        content: bytes,
+        headers: Mapping[str, str],
+        timeout: float,
+    ) -> _TurnstileResponseDictCF:
+        """Send the request and return the decoded JSON response."""
+        ...
+
+    async def aclose(self) -> None:
+        """Release any connections owned by the transport."""
+        ...
+
+
+def _missing_extra(package: str) -> ImportError:
+    return ImportError(
+        f"The {package} transport requires the '{package}' package. "
+        f"Install it with: pip install pyturnstile[{package}]"
+    )
+
+
+def _http2_available() -> bool:
+    """Return True if the `h2` package needed by httpx for HTTP/2 is installed."""
+    return importlib.util.find_spec("h2") is not None
+
+
+def _warmup_in_threads(ping: Callable[[], bool], connections: int) -> int:
+    """Run `ping` concurrently so that each call needs its own pooled connection."""
+    with ThreadPoolExecutor(max_workers=connections) as executor:
+        return sum(executor.map(lambda _: ping(), range(connections)))
+
+
+@functools.lru_cache(maxsize=8)
+def _httpx_url(url: str) -> httpx.URL:
+    """Parse a URL once, since the siteverify endpoint rarely changes."""
+    return httpx.URL(url)
+
+
+class HttpxTransport:
+    """Synchronous transport backed by an `httpx.Client` (the default)."""
+
+    def __init__(
+        self,
+        client: Optional[httpx.Client] = None,
+        *,
+        limits: Optional[httpx.Limits] = None,
+        http2: bool = False,
+        max_concurrent_requests: Optional[int] = None,
+    ) -> None:
+        """
+        Args:
+            client: (Optional) An existing client to reuse. Not closed by the transport.
+            limits: (Optional) Connection pool limits when the transport creates its own client.
+            http2: (Optional) Enable HTTP/2 when the transport creates its own client.
+                Requires the `h2` package.
+            max_concurrent_requests: (Optional) Maximum number of requests in flight at once.
+                Further requests wait for a free slot.
+        """
+        self._owns_client = client is None
+        self.client = client or httpx.Client(
+            limits=limits or httpx.Limits(), http2=http2
+        )
+        self.max_concurrent_requests = max_concurrent_requests
+        self._slots = (
+            threading.BoundedSemaphore(max_concurrent_requests)
+            if max_concurrent_requests
+            else None
+        )
+
+    def post(
+        self,
+        url: str,
+        content: bytes,
+        headers: Mapping[str, str],
+        timeout: float,
+    ) -> _TurnstileResponseDictCF:
+        if self._slots is None:
+            return self._post(url, content, headers, timeout)
+        with self._slots:
+            return self._post(url, content, headers, timeout)
+
+    def _post(
+        self,
+        url: str,
+        content: bytes,
+        headers: Mapping[str, str],
+        timeout: float,
+    ) -> _TurnstileResponseDictCF:
+        response = self.client.post(
+            _httpx_url(url), content=content, headers=headers, timeout=timeout
+        )
+        response.raise_for_status()
+        return response.json()
+
+    def warmup(self, url: str, connections: int, timeout: float) -> int:
+        def ping() -> bool:
+            try:
+                self.client.head(_httpx_url(url), timeout=timeout)
+            except httpx.HTTPError:
+                return False
+            return True
+
+        return _warmup_in_threads(ping, connections)
+
+    def close(self) -> None:
+        if self._owns_client:
+            self.client.close()
+
+
+class AsyncHttpxTransport:
+    """Asynchronous transport backed by an `httpx.AsyncClient` (the default)."""
+
+    def __init__(
+        self,
+        client: Optional[httpx.AsyncClient] = None,
+        *,
+        limits: Optional[httpx.Limits] = None,
+        http2: bool = False,
+        max_concurrent_requests: Optional[int] = None,
+    ) -> None:
+        """
+        Args:
+            client: (Optional) An existing client to reuse. Not closed by the transport.
+            limits: (Optional) Connection pool limits when the transport creates its own client.
+            http2: (Optional) Enable HTTP/2 when the transport creates its own client.
+                Requires the `h2` package.
+            max_concurrent_requests: (Optional) Maximum number of requests in flight at once.
+                Further requests wait for a free slot.
+        """
+        self._owns_client = client is None
+        self.client = client or httpx.AsyncClient(
+            limits=limits or httpx.Limits(), http2=http2
+        )
+        self.max_concurrent_requests = max_concurrent_requests
+        # Created on first use so that it binds to the running event loop.
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    async def post(
+        self,
+        url: str,
+        content: bytes,
+        headers: Mapping[str, str],
+        timeout: float,
+    ) -> _TurnstileResponseDictCF:
+        if not self.max_concurrent_requests:
+            return await self._post(url, content, headers, timeout)
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_concurrent_requests)
+        async with self._slots:
+            return await self._post(url, content, headers, timeout)
+
+    async def _post(
+        self,
+        url: str,
+        content: bytes,
+        headers: Mapping[str, str],
+        timeout: float,
+    ) -> _TurnstileResponseDictCF:
+        response = await self.client.post(
+            _httpx_url(url), content=content, headers=headers, timeout=timeout
+        )
+        response.raise_for_status()
+        return response.json()
+
+    async def warmup(self, url: str, connections: int, timeout: float) -> int:
+        async def ping() -> bool:
+            try:
+                await self.client.head(_httpx_url(url), timeout=timeout)
+            except httpx.HTTPError:
+                return False
+            return True
+
+        return sum(await asyncio.gather(*(ping() for _ in range(connections))))
+
+    async def aclose(self) -> None:
+        if self._owns_client:
+            await self.client.aclose()
+
+
+_SINGLE_CONNECTION = httpx.Limits(max_connections=1, max_keepalive_connections=1)
+
+
+class Http2Transport:
+    """
+    Synchronous HTTP/2 transport spreading requests over several connections.
+
+    httpx sends every request over its first HTTP/2 connection, however many
+    streams are already open on it. Each connection here therefore has its own
+    single-connection client. A request goes to the connection with the fewest
+    requests in flight, and waits for a free stream if that one already has
+    `max_streams`.
+    """
+
+    def __init__(
+        self,
+        clients: Optional[Sequence[httpx.Client]] = None,
+        *,
+        connections: int = 2,
+        max_streams: int = 100,
+    ) -> None:
+        """
+        Args:
+            clients: (Optional) Existing clients to use, one per connection, each limited
+                to a single connection. Not closed by the transport.
+            connections: (Optional) Number of HTTP/2 connections when `clients` is not given.
+                Requires the `h2` package.
+            max_streams: (Optional) Maximum concurrent requests per connection.
+        """
+        if connections <= 0 or max_streams <= 0:
+            raise ValueError("connections and max_streams must be positive")
+        if clients is None:
+            self.lanes = [
+                HttpxTransport(
+                    limits=_SINGLE_CONNECTION,
+                    http2=True,
+                    max_concurrent_requests=max_streams,
+                )
+                for _ in range(connections)
+            ]
+        else:
+            self.lanes = [
+                HttpxTransport(client, max_concurrent_requests=max_streams)
+                for client in clients
+            ]
+        self.max_streams = max_streams
+        self._in_flight = [0] * len(self.lanes)
+        self._lock = threading.Lock()
+
+    def post(
+        self,
+        url: str,
+        content: bytes,
+        headers: Mapping[str, str],
+        timeout: float,
+    ) -> _TurnstileResponseDictCF:
+        with self._lock:
+            lane = min(range(len(self.lanes)), key=self._in_flight.__getitem__)
+            self._in_flight[lane] += 1
+        try:
+            return self.lanes[lane].post(url, content, headers, timeout)
+        finally:
+            with self._lock:
+                self._in_flight[lane] -= 1
+
+    def warmup(self, url: str, connections: int, timeout: float) -> int:
+        """Open the first `connections` connections (at most one per client)."""
+        lanes = self.lanes[:connections]
+        with ThreadPoolExecutor(max_workers=max(len(lanes), 1)) as executor:
+            return sum(executor.map(lambda lane: lane.warmup(url, 1, timeout), lanes))
+
+    def close(self) -> None:
+        for lane in self.lanes:
+            lane.close()
+
+
+class AsyncHttp2Transport:
+    """Asynchronous version of `Http2Transport`."""
+
+    def __init__(
+        self,
+        clients: Optional[Sequence[httpx.AsyncClient]] = None,
+        *,
+        connections: int = 2,
+        max_streams: int = 100,
+    ) -> None:
+        """
+        Args:
+            clients: (Optional) Existing clients to use, one per connection, each limited
+                to a single connection. Not closed by the transport.
+            connections: (Optional) Number of HTTP/2 connections when `clients` is not given.
+                Requires the `h2` package.
+            max_streams: (Optional) Maximum concurrent requests per connection.
+        """
+        if connections <= 0 or max_streams <= 0:
+            raise ValueError("connections and max_streams must be positive")
+        if clients is None:
+            self.lanes = [
+                AsyncHttpxTransport(
+                    limits=_SINGLE_CONNECTION,
+                    http2=True,
+                    max_concurrent_requests=max_streams,
+                )
+                for _ in range(connections)
+            ]
+        else:
+            self.lanes = [
+                AsyncHttpxTransport(client, max_concurrent_requests=max_streams)
+                for client in clients
+            ]
+        self.max_streams = max_streams
+        self._in_flight = [0] * len(self.lanes)
+
+    async def post(
+        self,
+        url: str,
+        content: bytes,
+        headers: Mapping[str, str],
+        timeout: float,
+    ) -> _TurnstileResponseDictCF:
+        lane = min(range(len(self.lanes)), key=self._in_flight.__getitem__)
+        self._in_flight[lane] += 1
+        try:
+            return await self.lanes[lane].post(url, content, headers, timeout)
+        finally:
+            self._in_flight[lane] -= 1
+
+    async def warmup(self, url: str, connections: int, timeout: float) -> int:
+        """Open the first `connections` connections (at most one per client)."""
+        lanes = self.lanes[:connections]
+        return sum(
+            await asyncio.gather(*(lane.warmup(url, 1, timeout) for lane in lanes))
+        )
+
+    async def aclose(self) -> None:
+        for lane in self.lanes:
+            await lane.aclose()
+
+
+class Urllib3Transport:
+    """Synchronous transport backed by a `urllib3.PoolManager`."""
+
+    def __init__(self, pool: Optional[urllib3.PoolManager] = None) -> None:
+        """
+        Args:
+            pool: (Optional) An existing pool manager to reuse. Not cleared by the transport.
+        """
+        try:
+            import urllib3
+        except ImportError as e:
+            raise _missing_extra("urllib3") from e
+
+        self._urllib3 = urllib3
+        self._owns_pool = pool is None
+        self.pool = pool or urllib3.PoolManager()
+
+    def post(
+        self,
+        url: str,
+        content: bytes,
+        headers: Mapping[str, str],
+        timeout: float,
+    ) -> _TurnstileResponseDictCF:
+        response = self.pool.request(
+            "POST",
+            url,
+            body=content,
+            headers=dict(headers),
+            timeout=self._urllib3.Timeout(total=timeout),
+            retries=False,
+        )
+        if response.status >= 400:
+            raise self._urllib3.exceptions.HTTPError(
+                f"Server error '{response.status}' for url '{url}'"
+            )
+        return json.loads(response.data)
+
+    def warmup(self, url: str, connections: int, timeout: float) -> int:
+        def ping() -> bool:
+            try:
+                self.pool.request(
+                    "HEAD",
+                    url,
+                    timeout=self._urllib3.Timeout(total=timeout),
+                    retries=False,
+                )
+            except self._urllib3.exceptions.HTTPError:
+                return False
+            return True
+
+        return _warmup_in_threads(ping, connections)
+
+    def close(self) -> None:
+        if self._owns_pool:
+            self.pool.clear()
+
+
+class AiohttpTransport:
+    """Asynchronous transport backed by an `aiohttp.ClientSession`."""
+
+    def __init__(self, session: Optional[aiohttp.ClientSession] = None) -> None:
+        """
+        Args:
+            session: (Optional) An existing session to reuse. Not closed by the transport.
+                When omitted, a session is created on first use, inside the running loop.
+        """
+        try:
+            import aiohttp
+        except ImportError as e:
+            raise _missing_extra("aiohttp") from e
+
+        self._aiohttp = aiohttp
+        self._owns_session = session is None
+        self.session = session
+
+    async def post(
+        self,
+        url: str,
+        content: bytes,
+        headers: Mapping[str, str],
+        timeout: float,
+    ) -> _TurnstileResponseDictCF:
+        if self.session is None:
+            self.session = self._aiohttp.ClientSession()
+        async with self.session.post(
+            url,
+            data=content,
+            headers=dict(headers),
+            timeout=self._aiohttp.ClientTimeout(total=timeout),
+        ) as response:
+            response.raise_for_status()
+            return await response.json(content_type=None)
+
+    async def warmup(self, url: str, connections: int, timeout: float) -> int:
+        if self.session is None:
+            self.session = self._aiohttp.ClientSession()
+        session = self.session
+
+        async def ping() -> bool:
+            try:
+                async with session.head(
+                    url, timeout=self._aiohttp.ClientTimeout(total=timeout)
+                ):
+                    return True
+            except (self._aiohttp.ClientError, asyncio.TimeoutError):
+                return False
+
+        return sum(await asyncio.gather(*(ping() for _ in range(connections))))
+
+    async def aclose(self) -> None:
+        if self._owns_session and self.session is not None:
+            await self.session.close()
+            self.session = None
+
+
+MemoryHandler = Union[Mapping[str, Any], Callable[[Dict[str, str]], Mapping[str, Any]]]
+"""A fixed JSON response, or a callable mapping the submitted form to one."""
+
+
+class MemoryTransport:
+    """
+    In-memory transport for tests. No network traffic is sent.
+
+    Example:
+        >>> transport = MemoryTransport({"success": True, "hostname": "example.com"})
+        >>> turnstile = Turnstile(secret="secret", transport=transport)
+        >>> turnstile.validate("token").success
+        True
+        >>> transport.requests[0]["response"]
+        'token'
+    """
+
+    def __init__(self, handler: MemoryHandler) -> None:
+        """
+        Args:
+            handler: The response to return, or a callable receiving the submitted
+                form fields and returning the response. Exceptions it raises propagate.
+        """
+        self.handler = handler
+        self.requests: List[Dict[str, str]] = []
+        """The decoded form fields of every request received."""
+
+    def _respond(self, content: bytes) -> _TurnstileResponseDictCF:
+        form = dict(parse_qsl(content.decode("ascii")))
+        self.requests.append(form)
+        handler = self.handler
+        response = handler(form) if callable(handler) else handler
+        # Copy so that response post-processing never mutates the handler's data.
+        return json.loads(json.dumps(response))
+
+    def post(
+        self,
+        url: str,
+        content: bytes,
+        headers: Mapping[str, str],
+        timeout: float,
+    ) -> _TurnstileResponseDictCF:
+        return self._respond(content)
+
+    def warmup(self, url: str, connections: int, timeout: float) -> int:
+        return connections
+
+    def close(self) -> None:
+        pass
+
+
+class AsyncMemoryTransport(MemoryTransport):
+    """Asynchronous version of `MemoryTransport`."""
+
+    async def post(  # type: ignore[override]
+        self,
+        url: str,
+        content: bytes,
+        headers: Mapping[str, str],
+        timeout: float,
+    ) -> _TurnstileResponseDictCF:
+        return self._respond(content)
+
+    async def warmup(  # type: ignore[override]
+        self, url: str, connections: int, timeout: float
+    ) -> int:
+        return connections
+
+    async def aclose(self) -> None:
+        pass
+
+
+__all__ = [
+    "Transport",
+    "AsyncTransport",
+    "HttpxTransport",
+    "AsyncHttpxTransport",
+    "Http2Transport",
+    "AsyncHttp2Transport",
+    "Urllib3Transport",
+    "AiohttpTransport",
+    "MemoryTransport",
+    "AsyncMemoryTransport",
+]
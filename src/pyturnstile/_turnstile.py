@@ -2,9 +2,41 @@
 
 from __future__ import annotations
 
-from typing import Optional
+import asyncio
+import functools
+import threading
+import time
+import warnings
+from typing import Any, Dict, Optional, Tuple, Union
+
+import httpx
 
 from . import _core  # type: ignore
+from ._cache import _NegativeCache
+from ._transports import (
+    AsyncHttp2Transport,
+    AsyncHttpxTransport,
+    AsyncTransport,
+    Http2Transport,
+    HttpxTransport,
+    Transport,
+    _http2_available,
+)
+from ._sidecar import AsyncUnixSocketTransport, UnixSocketTransport, parse_unix_url
+from ._types import NegativeCacheStats
+
+
+_PreviousSecret = Tuple[str, _core._RequestTemplate, float]
+"""A rotated-out secret, its request template and when it stops being accepted."""
+
+
+def _in_event_loop() -> bool:
+    """Return True if the calling thread is running an asyncio event loop."""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
 
 
 class Turnstile:
@@ -31,15 +63,335 @@ class Turnstile:
         >>> if response.success:
         ...     print("Valid token")
 
+        Caching terminal failures (e.g. replayed tokens) for 30 seconds:
+        >>> turnstile = Turnstile(secret="your-secret-key", negative_cache_ttl=30)
+
+        Rotating the secret while still accepting the old one for an hour:
+        >>> turnstile.rotate_secret("new-secret-key", grace_period=3600)
+
+        Opening connections before the first login, and keeping them open:
+        >>> await turnstile.async_warmup(connections=4, keepalive_interval=4)
+        >>> turnstile.is_warm
+        True
+
+        Sharing one pool and cache across worker processes through a local daemon
+        (started with `python -m pyturnstile.daemon --socket /run/pyturnstile.sock`):
+        >>> turnstile = Turnstile(secret="your-secret-key", transport="unix:///run/pyturnstile.sock")
+
+        Multiplexing concurrent validations over two HTTP/2 connections:
+        >>> async with Turnstile(secret="your-secret-key", http2=True) as turnstile:
+        ...     responses = await asyncio.gather(*(turnstile.async_validate(t) for t in tokens))
+
     """
 
-    def __init__(self, secret: str):
+    def __init__(
+        self,
+        secret: str,
+        *,
+        negative_cache_ttl: Optional[float] = None,
+        negative_cache_size: int = 10_000,
+        client: Optional[httpx.Client] = None,
+        async_client: Optional[httpx.AsyncClient] = None,
+        transport: Union[Transport, str, None] = None,
+        async_transport: Optional[AsyncTransport] = None,
+        http2: bool = False,
+        http2_connections: int = 2,
+        http2_max_streams: int = 100,
+    ):
         """
         Initialize the Turnstile client with your secret key.
         Args:
             secret: Your widget's secret key from the Cloudflare dashboard.
+            negative_cache_ttl: (Optional) Seconds to remember tokens rejected with
+                `invalid-input-response` or `timeout-or-duplicate`. Disabled when None.
+            negative_cache_size: (Optional) Maximum number of tokens kept in the negative cache.
+            client: (Optional) A shared `httpx.Client` used by `validate`. Not closed by this class.
+            async_client: (Optional) A shared `httpx.AsyncClient` used by `async_validate`.
+                Not closed by this class.
+            transport: (Optional) A sync transport (e.g. `Urllib3Transport`) used instead of `client`,
+                or a `unix:///path/to.sock` URL to validate through a `pyturnstile.daemon` sidecar
+                (also used for async requests unless `async_transport` is given).
+            async_transport: (Optional) An async transport (e.g. `AiohttpTransport`) used instead of
+                `async_client`.
+            http2: (Optional) Send requests over a pooled HTTP/2 client owned by this instance,
+                for whichever of `transport`/`async_transport` is not given. Falls back to HTTP/1.1
+                with a warning if the `h2` package is not installed.
+            http2_connections: (Optional) Number of HTTP/2 connections requests are spread over.
+            http2_max_streams: (Optional) Maximum concurrent requests per HTTP/2 connection.
+                Further requests wait for a free stream.
         """
         self.secret = secret
+        self._previous_secret: Optional[_PreviousSecret] = None
+        self._owns_transport = self._owns_async_transport = False
+        if isinstance(transport, str):
+            path = parse_unix_url(transport)
+            transport = UnixSocketTransport(path)
+            self._owns_transport = True
+            if async_transport is None:
+                async_transport = AsyncUnixSocketTransport(path)
+                self._owns_async_transport = True
+        if transport is None and client is not None:
+            transport = HttpxTransport(client)
+        if async_transport is None and async_client is not None:
+            async_transport = AsyncHttpxTransport(async_client)
+        if http2:
+            http2_options = self._http2_options(http2_connections, http2_max_streams)
+            if transport is None:
+                transport = (
+                    Http2Transport(**http2_options)
+                    if http2_options
+                    else HttpxTransport()
+                )
+                self._owns_transport = True
+            if async_transport is None:
+                async_transport = (
+                    AsyncHttp2Transport(**http2_options)
+                    if http2_options
+                    else AsyncHttpxTransport()
+                )
+                self._owns_async_transport = True
+        self._transport = transport
+        self._async_transport = async_transport
+        self._warm = False
+        self._keepalive_stop: Optional[threading.Event] = None
+        # Only guards the lazy creation of shared state, never a request.
+        self._init_lock = threading.Lock()
+        self._keepalive_task: Optional[asyncio.Future[None]] = None
+        self._negative_cache: Optional[_NegativeCache] = None
+        if negative_cache_ttl is not None:
+            self._negative_cache = _NegativeCache(
+                ttl=negative_cache_ttl, maxsize=negative_cache_size
+            )
+
+    @staticmethod
+    def _http2_options(connections: int, max_streams: int) -> Optional[Dict[str, int]]:
+        """Build HTTP/2 transport options, or None to fall back to HTTP/1.1."""
+        if connections <= 0 or max_streams <= 0:
+            raise ValueError("http2_connections and http2_max_streams must be positive")
+        if not _http2_available():
+            warnings.warn(
+                "HTTP/2 requires the 'h2' package (pip install pyturnstile[http2]); "
+                "falling back to HTTP/1.1.",
+                RuntimeWarning,
+                stacklevel=3,
+            )
+            return None
+        return {"connections": connections, "max_streams": max_streams}
+
+    @property
+    def secret(self) -> str:
+        """The secret key requests are sent with."""
+        return self._secret
+
+    @secret.setter
+    def secret(self, secret: str) -> None:
+        self._secret = secret
+        self._template = _core._RequestTemplate(secret)
+
+    @property
+    def is_warm(self) -> bool:
+        """Whether the last warm-up or keep-alive round opened every requested connection."""
+        return self._warm
+
+    def _pooled_transport(self) -> Transport:
+        """Return the sync transport, creating an owned pooled one if none was configured."""
+        transport = self._transport
+        if transport is None:
+            with self._init_lock:
+                if self._transport is None:
+                    self._transport = HttpxTransport()
+                    self._owns_transport = True
+                transport = self._transport
+        return transport
+
+    def _pooled_async_transport(self) -> AsyncTransport:
+        """Return the async transport, creating an owned pooled one if none was configured."""
+        if self._async_transport is None:
+            self._async_transport = AsyncHttpxTransport()
+            self._owns_async_transport = True
+        return self._async_transport
+
+    def _ping(self, transport: Any, connections: int, timeout: float) -> int:
+        """Run one warm-up round on a sync transport and update the readiness flag."""
+        warmup = getattr(transport, "warmup", None)
+        if warmup is None:
+            raise TypeError(f"{type(transport).__name__} does not support warmup")
+        warmed = warmup(_core.SITEVERIFY_URL, connections, timeout)
+        self._warm = warmed >= connections
+        return warmed
+
+    async def _async_ping(
+        self, transport: Any, connections: int, timeout: float
+    ) -> int:
+        """Run one warm-up round on an async transport and update the readiness flag."""
+        warmup = getattr(transport, "warmup", None)
+        if warmup is None:
+            raise TypeError(f"{type(transport).__name__} does not support warmup")
+        warmed = await warmup(_core.SITEVERIFY_URL, connections, timeout)
+        self._warm = warmed >= connections
+        return warmed
+
+    def warmup(
+        self,
+        connections: int = 2,
+        *,
+        keepalive_interval: Optional[float] = None,
+        timeout: float = 10,
+    ) -> int:
+        """
+        Open pooled connections to Cloudflare's siteverify endpoint ahead of traffic.
+
+        If no sync transport was configured, a pooled httpx transport owned by this
+        instance is created so that later `validate` calls reuse the connections.
+        Args:
+            connections: (Optional) Number of connections to open concurrently.
+            keepalive_interval: (Optional) Re-run the warm-up from a background thread every
+                this many seconds, so idle connections are not dropped. Must be shorter than the
+                pool's keep-alive expiry (5 seconds for httpx by default). Stopped by `close()`.
+            timeout: (Optional) Timeout for each warm-up request in seconds.
+        Returns:
+            int: The number of connections that were opened successfully.
+        Raises:
+            TypeError: If the configured transport does not support warm-up.
+        """
+        transport = self._pooled_transport()
+        warmed = self._ping(transport, connections, timeout)
+
+        with self._init_lock:
+            start_keepalive = (
+                keepalive_interval is not None and self._keepalive_stop is None
+            )
+            if start_keepalive:
+                stop = self._keepalive_stop = threading.Event()
+        if start_keepalive:
+
+            def keepalive() -> None:
+                while not stop.wait(keepalive_interval):
+                    try:
+                        self._ping(transport, connections, timeout)
+                    except Exception:
+                        # e.g. the pool was closed while a round was running
+                        self._warm = False
+
+            threading.Thread(
+                target=keepalive, name="pyturnstile-keepalive", daemon=True
+            ).start()
+        return warmed
+
+    async def async_warmup(
+        self,
+        connections: int = 2,
+        *,
+        keepalive_interval: Optional[float] = None,
+        timeout: float = 10,
+    ) -> int:
+        """
+        Asynchronously open pooled connections to Cloudflare's siteverify endpoint.
+
+        If no async transport was configured, a pooled httpx transport owned by this
+        instance is created so that later `async_validate` calls reuse the connections.
+        Args:
+            connections: (Optional) Number of connections to open concurrently.
+            keepalive_interval: (Optional) Re-run the warm-up from a background task every
+                this many seconds, so idle connections are not dropped. Must be shorter than the
+                pool's keep-alive expiry (5 seconds for httpx by default). Stopped by `aclose()`.
+            timeout: (Optional) Timeout for each warm-up request in seconds.
+        Returns:
+            int: The number of connections that were opened successfully.
+        Raises:
+            TypeError: If the configured transport does not support warm-up.
+        """
+        transport = self._pooled_async_transport()
+        warmed = await self._async_ping(transport, connections, timeout)
+
+        if keepalive_interval is not None and self._keepalive_task is None:
+            interval = keepalive_interval
+
+            async def keepalive() -> None:
+                while True:
+                    await asyncio.sleep(interval)
+                    try:
+                        await self._async_ping(transport, connections, timeout)
+                    except Exception:
+                        self._warm = False
+
+            self._keepalive_task = asyncio.ensure_future(keepalive())
+        return warmed
+
+    def close(self) -> None:
+        """Stop the keep-alive thread and close the sync connection pool if this instance created it."""
+        if self._keepalive_stop is not None:
+            self._keepalive_stop.set()
+            self._keepalive_stop = None
+        if self._owns_transport and self._transport is not None:
+            self._transport.close()
+
+    async def aclose(self) -> None:
+        """Stop keep-alives and close the connection pools this instance created."""
+        self.close()
+        if self._keepalive_task is not None:
+            self._keepalive_task.cancel()
+            try:
+                await self._keepalive_task
+            except asyncio.CancelledError:
+                pass
+            self._keepalive_task = None
+        if self._owns_async_transport and self._async_transport is not None:
+            await self._async_transport.aclose()
+
+    def __enter__(self) -> Turnstile:
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        self.close()
+
+    async def __aenter__(self) -> Turnstile:
+        return self
+
+    async def __aexit__(self, *args: object) -> None:
+        await self.aclose()
+
+    @property
+    def negative_cache_stats(self) -> Optional[NegativeCacheStats]:
+        """Counters for the negative cache, or None if it is disabled."""
+        if self._negative_cache is None:
+            return None
+        return self._negative_cache.stats()
+
+    def clear_negative_cache(self) -> None:
+        """Forget all cached failures."""
+        if self._negative_cache is not None:
+            self._negative_cache.clear()
+
+    def rotate_secret(self, new_secret: str, *, grace_period: float = 7200) -> None:
+        """
+        Switch to a new secret key while still accepting the current one for a while.
+
+        During the grace period, tokens rejected with `invalid-input-secret` are
+        re-validated with the previous secret.
+        Args:
+            new_secret: The new secret key from the Cloudflare dashboard.
+            grace_period: (Optional) Seconds during which the previous secret is still tried.
+        """
+        self._previous_secret = (
+            self.secret,
+            self._template,
+            time.monotonic() + grace_period,
+        )
+        self.secret = new_secret
+
+    def _fallback_secret(
+        self, response: _core.TurnstileResponse
+    ) -> Optional[Tuple[str, _core._RequestTemplate]]:
+        """Return the previous secret and its template if the response warrants retrying with it."""
+        previous = self._previous_secret
+        if previous is None or "invalid-input-secret" not in response.error_codes:
+            return None
+        secret, template, expires_at = previous
+        if time.monotonic() >= expires_at:
+            self._previous_secret = None
+            return None
+        return secret, template
 
     def validate(
         self,
@@ -53,6 +405,11 @@ class Turnstile:
     ) -> _core.TurnstileResponse:
         """
         Validate a Turnstile token with Cloudflare's API.
+
+        Requests reuse a pooled connection owned by this instance unless a client or
+        transport was given. Calling it from a thread that is running an event loop
+        blocks the loop for the whole request and emits a `RuntimeWarning`; use
+        `async_validate` there.
         Args:
             token: The token from the client-side widget
             idempotency_key: (Optional) UUID for retry protection
@@ -67,15 +424,38 @@ class Turnstile:
 
         For more details on all available parameters, see the [Cloudflare documentation](https://developers.cloudflare.com/turnstile/get-started/server-side-validation/#required-parameters)
         """
-        return _core.validate(
+        if _in_event_loop():
+            warnings.warn(
+                "Turnstile.validate() was called from a running event loop, which is "
+                "blocked until Cloudflare answers; use 'await Turnstile.async_validate()' "
+                "instead.",
+                RuntimeWarning,
+                stacklevel=2,
+            )
+
+        if self._negative_cache is not None:
+            cached = self._negative_cache.get(token)
+            if cached is not None:
+                return cached
+
+        request = functools.partial(
+            _core.validate,
             token=token,
-            secret=self.secret,
             expected_remoteip=expected_remoteip,
             expected_hostname=expected_hostname,
             expected_action=expected_action,
             idempotency_key=idempotency_key,
             timeout=timeout,
+            transport=self._pooled_transport(),
         )
+        response = request(secret=self.secret, template=self._template)
+        fallback = self._fallback_secret(response)
+        if fallback is not None:
+            response = request(secret=fallback[0], template=fallback[1])
+
+        if self._negative_cache is not None:
+            self._negative_cache.put(token, response)
+        return response
 
     async def async_validate(
         self,
@@ -103,15 +483,29 @@ class Turnstile:
 
         For more details on all available parameters, see the [Cloudflare documentation](https://developers.cloudflare.com/turnstile/get-started/server-side-validation/#required-parameters)
         """
-        return await _core.async_validate(
+        if self._negative_cache is not None:
+            cached = self._negative_cache.get(token)
+            if cached is not None:
+                return cached
+
+        request = functools.partial(
+            _core.async_validate,
             token=token,
-            secret=self.secret,
             expected_remoteip=expected_remoteip,
             expected_hostname=expected_hostname,
             expected_action=expected_action,
             idempotency_key=idempotency_key,
             timeout=timeout,
+            transport=self._async_transport,
         )
+        response = await request(secret=self.secret, template=self._template)
+        fallback = self._fallback_secret(response)
+        if fallback is not None:
+            response = await request(secret=fallback[0], template=fallback[1])
+
+        if self._negative_cache is not None:
+            self._negative_cache.put(token, response)
+        return response
 
 
 __all__ = ["Turnstile"]
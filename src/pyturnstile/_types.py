@@ -56,6 +56,23 @@ TurnstileResponseDict = TypedDict(
 """Type definition for the TurnstileResponse dictionary representation."""
 
 
+class NegativeCacheStats(TypedDict):
+    """Counters describing the state of a `Turnstile` negative cache."""
+
+    hits: int
+    """Lookups answered from the cache"""
+    misses: int
+    """Lookups that had to go to Cloudflare's API"""
+    stores: int
+    """Failed responses added to the cache"""
+    evictions: int
+    """Entries dropped because the cache was full"""
+    size: int
+    """Number of entries currently cached"""
+    maxsize: int
+    """Maximum number of entries the cache can hold"""
+
+
 class TurnstileResponse:
     """
     Represents the response from Cloudflare's Turnstile validation API.
@@ -134,5 +151,6 @@ __all__ = [
     "TurnstileValidationError",
     "TurnstileErrorCodes",
     "TurnstileResponseDict",
+    "NegativeCacheStats",
     "_TurnstileResponseDictCF",
 ]
@@ -0,0 +1,406 @@
+"""
+Local validation sidecar shared by many worker processes.
+
+Pre-fork servers (gunicorn, uWSGI, multiprocess uvicorn) otherwise give every
+worker its own connection pool, negative cache and warm-up state. Running one
+daemon per host and pointing the workers at its Unix socket lets them share a
+single pool, and optionally one negative cache. A token replayed while its first
+validation is still in flight, from any worker, is rejected without another
+round trip.
+
+Usage:
+    $ python -m pyturnstile.daemon --socket /run/pyturnstile.sock --warmup 4
+
+    >>> turnstile = Turnstile(secret="your-secret-key", transport="unix:///run/pyturnstile.sock")
+
+Workers fall back to calling Cloudflare directly while the daemon is not running.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import signal
+import stat
+import struct
+import sys
+import time
+from typing import Any, Dict, List, Optional, Set
+
+from ._cache import _NegativeCache
+from ._core import SITEVERIFY_URL
+from ._sidecar import (
+    _LENGTH,
+    MAX_FRAME_SIZE,
+    MSG_STATS,
+    MSG_VALIDATE,
+    STATUS_ERROR,
+    STATUS_OK,
+    UnixSocketTransport,
+    decode_validate,
+    frame,
+)
+from ._transports import AsyncHttp2Transport, AsyncHttpxTransport, AsyncTransport
+from ._turnstile import Turnstile
+from ._types import TurnstileResponse
+
+DEFAULT_SOCKET = os.environ.get("PYTURNSTILE_SOCKET", "/tmp/pyturnstile.sock")
+"""Socket path used when none is given (overridable with `PYTURNSTILE_SOCKET`)."""
+
+_FORM_HEADERS = {"Content-Type": "application/x-www-form-urlencoded"}
+
+_IDEMPOTENCY_FIELD = b"&idempotency_key="
+
+_DUPLICATE_RESPONSE = bytes([STATUS_OK]) + json.dumps(
+    {"success": False, "error-codes": ["timeout-or-duplicate"]}
+).encode("utf-8")
+"""What Cloudflare answers when a token is validated a second time."""
+
+_COUNTERS = ("requests", "coalesced", "rejected", "cached", "errors")
+
+
+class TurnstileDaemon:
+    """
+    A siteverify proxy listening on a Unix socket.
+
+    Workers send the pre-encoded form body of each validation; the daemon posts it
+    through one pooled async transport and returns Cloudflare's JSON unchanged.
+    Only `url` is ever contacted. Hostname and action checks stay in the workers.
+
+    A request with the same body as one already in flight is not sent again.
+    Tokens are single-use, so such a replay is answered with `timeout-or-duplicate`,
+    as Cloudflare would. Only requests carrying an `idempotency_key`, which
+    Cloudflare lets callers repeat, share the in-flight request's result.
+
+    With `negative_cache_ttl`, terminal failures are remembered by request body and
+    answered without a round trip, for every worker (see `Turnstile`).
+
+    Example:
+        >>> daemon = TurnstileDaemon("/run/pyturnstile.sock", http2=True)
+        >>> await daemon.serve_forever()
+    """
+
+    def __init__(
+        self,
+        path: str,
+        *,
+        url: str = SITEVERIFY_URL,
+        transport: Optional[AsyncTransport] = None,
+        http2: bool = False,
+        http2_connections: int = 2,
+        http2_max_streams: int = 100,
+        mode: Optional[int] = 0o600,
+        negative_cache_ttl: Optional[float] = None,
+        negative_cache_size: int = 10_000,
+        max_processes: int = 256,
+    ):
+        """
+        Args:
+            path: Path of the Unix socket to listen on. A stale socket file is replaced.
+            url: (Optional) The only siteverify endpoint requests are sent to. Requests
+                for any other URL are rejected, so the daemon cannot be used as an open proxy.
+            transport: (Optional) The async transport to send requests with. Not closed by the daemon.
+                Defaults to a pooled `AsyncHttpxTransport`.
+            http2: (Optional) Use HTTP/2 for the default transport. See `Turnstile`.
+            http2_connections: (Optional) Number of HTTP/2 connections requests are spread over.
+            http2_max_streams: (Optional) Maximum concurrent requests per HTTP/2 connection.
+            mode: (Optional) Permission bits for the socket file. Anyone who can connect can
+                send requests through the daemon, so only grant access to the workers' user or group.
+            negative_cache_ttl: (Optional) Seconds to remember requests rejected with
+                `invalid-input-response` or `timeout-or-duplicate`. Disabled when None.
+            negative_cache_size: (Optional) Maximum number of requests kept in the negative cache.
+            max_processes: (Optional) Number of most recently active worker PIDs whose
+                counters are kept. Older ones are dropped from `stats()["processes"]`.
+        """
+        self.path = path
+        self.url = url
+        self.mode = mode
+        self._owns_transport = transport is None
+        if transport is None:
+            options = (
+                Turnstile._http2_options(http2_connections, http2_max_streams)
+                if http2
+                else None
+            )
+            transport = (
+                AsyncHttp2Transport(**options) if options else AsyncHttpxTransport()
+            )
+        self.transport = transport
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._writers: Set[asyncio.StreamWriter] = set()
+        self._in_flight: Dict[bytes, asyncio.Future[bytes]] = {}
+        self._negative_cache: Optional[_NegativeCache] = None
+        if negative_cache_ttl is not None:
+            self._negative_cache = _NegativeCache(
+                ttl=negative_cache_ttl, maxsize=negative_cache_size
+            )
+        self.max_processes = max_processes
+        # Ordered from least to most recently active.
+        self._processes: Dict[int, Dict[str, int]] = {}
+        self._totals = dict.fromkeys(_COUNTERS, 0)
+        self._started = time.monotonic()
+
+    async def start(self) -> None:
+        """Start listening on the socket."""
+        if os.path.exists(self.path) and stat.S_ISSOCK(os.stat(self.path).st_mode):
+            os.unlink(self.path)
+        self._server = await asyncio.start_unix_server(self._handle, path=self.path)
+        if self.mode is not None:
+            os.chmod(self.path, self.mode)
+
+    async def serve_forever(self) -> None:
+        """Start listening if needed and serve until cancelled."""
+        if self._server is None:
+            await self.start()
+        assert self._server is not None
+        await self._server.serve_forever()
+
+    async def warmup(self, connections: int, timeout: float = 10) -> int:
+        """Open pooled connections to Cloudflare. Returns the number opened."""
+        return await self.transport.warmup(self.url, connections, timeout)  # type: ignore
+
+    async def close(self) -> None:
+        """
+        Stop listening, close worker connections, remove the socket file and close
+        the owned transport.
+        """
+        if self._server is not None:
+            self._server.close()
+            # Workers keep idle connections pooled, and `wait_closed()` waits for
+            # every connection on Python 3.12+.
+            for writer in list(self._writers):
+                writer.close()
+            await self._server.wait_closed()
+            self._server = None
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+        if self._owns_transport:
+            await self.transport.aclose()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return request counters, in total and per worker process.
+
+        Returns:
+            dict: `uptime` in seconds, `in_flight` requests, the `requests`, `coalesced`
+                (idempotent repeats that shared a result), `rejected` (concurrent replays),
+                `cached` (negative cache hits) and `errors` totals, the same counters for
+                the `max_processes` most recently active worker PIDs in `processes`, and
+                the `negative_cache` counters (None if it is disabled).
+        """
+        return {
+            "pid": os.getpid(),
+            "uptime": time.monotonic() - self._started,
+            "in_flight": len(self._in_flight),
+            **self._totals,
+            "processes": {str(pid): dict(c) for pid, c in self._processes.items()},
+            "negative_cache": (
+                self._negative_cache.stats()
+                if self._negative_cache is not None
+                else None
+            ),
+        }
+
+    def _counters(self, pid: int) -> Dict[str, int]:
+        """Return the counters of a worker, marking it as the most recently active."""
+        counters = self._processes.pop(pid, None) or dict.fromkeys(_COUNTERS, 0)
+        self._processes[pid] = counters
+        if len(self._processes) > self.max_processes:
+            # Pre-fork servers recycle workers, so PIDs that went quiet are dropped.
+            del self._processes[next(iter(self._processes))]
+        return counters
+
+    def _count(self, counters: Dict[str, int], name: str) -> None:
+        counters[name] += 1
+        self._totals[name] += 1
+
+    async def _handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        """Serve framed requests on one connection, one at a time."""
+        self._writers.add(writer)
+        try:
+            while True:
+                try:
+                    (size,) = _LENGTH.unpack(await reader.readexactly(_LENGTH.size))
+                except asyncio.IncompleteReadError:
+                    break
+                if not 0 < size <= MAX_FRAME_SIZE:
+                    break
+                payload = await reader.readexactly(size)
+                writer.write(frame(await self._dispatch(payload)))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+
+    async def _dispatch(self, payload: bytes) -> bytes:
+        kind = payload[0]
+        if kind == MSG_VALIDATE:
+            try:
+                request = decode_validate(payload)
+            except (struct.error, UnicodeDecodeError):
+                return bytes([STATUS_ERROR]) + b"Malformed request"
+            return await self._validate(*request)
+        if kind == MSG_STATS:
+            return bytes([STATUS_OK]) + json.dumps(self.stats()).encode()
+        return bytes([STATUS_ERROR]) + f"Unknown message type {kind}".encode()
+
+    async def _validate(
+        self, pid: int, timeout: float, url: str, content: bytes
+    ) -> bytes:
+        counters = self._counters(pid)
+        self._count(counters, "requests")
+        if url != self.url:
+            self._count(counters, "errors")
+            return bytes([STATUS_ERROR]) + f"URL not allowed: {url}".encode("utf-8")
+
+        if self._negative_cache is not None:
+            cached = self._negative_cache.get(content.decode("latin-1"))
+            if cached is not None:
+                self._count(counters, "cached")
+                return _encode_failure(cached)
+
+        key = url.encode("utf-8") + b"\n" + content
+        future = self._in_flight.get(key)
+        if future is not None and _IDEMPOTENCY_FIELD not in content:
+            self._count(counters, "rejected")
+            return _DUPLICATE_RESPONSE
+        if future is not None:
+            self._count(counters, "coalesced")
+        else:
+            future = asyncio.ensure_future(self._post(url, content, timeout))
+            self._in_flight[key] = future
+            future.add_done_callback(lambda _: self._in_flight.pop(key, None))
+
+        # A worker disconnecting must not cancel a request other workers share.
+        response = await asyncio.shield(future)
+        if response[0] != STATUS_OK:
+            self._count(counters, "errors")
+        return response
+
+    async def _post(self, url: str, content: bytes, timeout: float) -> bytes:
+        try:
+            result = await self.transport.post(url, content, _FORM_HEADERS, timeout)
+        except Exception as e:
+            return bytes([STATUS_ERROR]) + str(e).encode("utf-8")
+        if self._negative_cache is not None:
+            self._negative_cache.put(
+                content.decode("latin-1"), TurnstileResponse(result)
+            )
+        return bytes([STATUS_OK]) + json.dumps(result).encode("utf-8")
+
+
+def _encode_failure(response: TurnstileResponse) -> bytes:
+    """Encode a cached failure as the siteverify JSON it was stored from."""
+    data: Dict[str, Any] = dict(response.to_dict())
+    data["error-codes"] = data.pop("error_codes")
+    return bytes([STATUS_OK]) + json.dumps(data).encode("utf-8")
+
+
+async def _keepalive(daemon: TurnstileDaemon, connections: int, interval: float):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await daemon.warmup(connections)
+        except Exception:
+            pass
+
+
+async def _run(args: argparse.Namespace) -> None:
+    daemon = TurnstileDaemon(
+        args.socket,
+        url=args.url,
+        http2=args.http2,
+        http2_connections=args.http2_connections,
+        http2_max_streams=args.http2_max_streams,
+        mode=int(args.mode, 8),
+        negative_cache_ttl=args.negative_cache_ttl,
+        negative_cache_size=args.negative_cache_size,
+    )
+    await daemon.start()
+    tasks: List[asyncio.Future[Any]] = []
+    if args.warmup:
+        await daemon.warmup(args.warmup)
+        if args.keepalive_interval:
+            tasks.append(
+                asyncio.ensure_future(
+                    _keepalive(daemon, args.warmup, args.keepalive_interval)
+                )
+            )
+
+    stop = asyncio.get_running_loop().create_future()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        asyncio.get_running_loop().add_signal_handler(
+            signum, lambda: stop.done() or stop.set_result(None)
+        )
+    print(f"pyturnstile daemon listening on {args.socket}", file=sys.stderr)
+    try:
+        await stop
+    finally:
+        for task in tasks:
+            task.cancel()
+        await daemon.close()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Entry point for `python -m pyturnstile.daemon`."""
+    parser = argparse.ArgumentParser(
+        prog="python -m pyturnstile.daemon",
+        description="Share one Turnstile connection pool between local worker processes.",
+    )
+    parser.add_argument("--socket", default=DEFAULT_SOCKET, help="Unix socket path")
+    parser.add_argument(
+        "--mode", default="600", help="socket file permissions, in octal"
+    )
+    parser.add_argument(
+        "--url",
+        default=SITEVERIFY_URL,
+        help="the only siteverify endpoint requests may be sent to",
+    )
+    parser.add_argument(
+        "--negative-cache-ttl",
+        type=float,
+        default=None,
+        help="seconds to remember rejected tokens for all workers (disabled by default)",
+    )
+    parser.add_argument("--negative-cache-size", type=int, default=10_000)
+    parser.add_argument("--http2", action="store_true", help="use HTTP/2")
+    parser.add_argument("--http2-connections", type=int, default=2)
+    parser.add_argument("--http2-max-streams", type=int, default=100)
+    parser.add_argument(
+        "--warmup", type=int, default=0, help="connections to open at startup"
+    )
+    parser.add_argument(
+        "--keepalive-interval",
+        type=float,
+        default=None,
+        help="seconds between warm-up rounds that keep the connections open",
+    )
+    parser.add_argument(
+        "--stats",
+        action="store_true",
+        help="print the statistics of the running daemon and exit",
+    )
+    args = parser.parse_args(argv)
+
+    if args.stats:
+        transport = UnixSocketTransport(args.socket)
+        try:
+            print(json.dumps(transport.stats(), indent=2))
+        finally:
+            transport.close()
+        return
+
+    asyncio.run(_run(args))
+
+
+if __name__ == "__main__":
+    main()
+
+
+__all__ = ["TurnstileDaemon", "main"]
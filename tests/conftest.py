@@ -2,7 +2,13 @@
 
 from __future__ import annotations
 
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from typing import Any
+from urllib.parse import parse_qsl
 
 import pytest
 
@@ -44,3 +50,155 @@ def mock_failure_response() -> dict[str, Any]:
         "action": "",
         "cdata": "",
     }
+
+
+class _SiteverifyHandler(BaseHTTPRequestHandler):
+    """Minimal siteverify endpoint answering from `server.responder`."""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_HEAD(self) -> None:
+        self.server.connections.add(self.client_address)  # type: ignore[attr-defined]
+        time.sleep(self.server.head_delay)  # type: ignore[attr-defined]
+        self.send_response(405)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_POST(self) -> None:
+        self.server.connections.add(self.client_address)  # type: ignore[attr-defined]
+        length = int(self.headers.get("Content-Length", 0))
+        form = dict(parse_qsl(self.rfile.read(length).decode()))
+        self.server.requests.append(form)  # type: ignore[attr-defined]
+        status, body = self.server.responder(form)  # type: ignore[attr-defined]
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+
+@pytest.fixture
+def siteverify_server(mock_success_response):
+    """
+    A local HTTP server standing in for Cloudflare's siteverify endpoint.
+
+    Set `server.responder` to a callable returning `(status, body)` for a form,
+    and read `server.requests` for the forms received. `server.url` is its URL.
+    `server.connections` holds the client address of every connection used, and
+    HEAD requests are answered after `server.head_delay` seconds.
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _SiteverifyHandler)
+    server.daemon_threads = True
+    server.requests = []  # type: ignore[attr-defined]
+    server.connections = set()  # type: ignore[attr-defined]
+    server.head_delay = 0.05  # type: ignore[attr-defined]
+    server.responder = lambda form: (200, mock_success_response)  # type: ignore[attr-defined]
+    server.url = f"http://127.0.0.1:{server.server_address[1]}/siteverify"  # type: ignore[attr-defined]
+    thread = threading.Thread(
+        target=server.serve_forever, kwargs={"poll_interval": 0.01}, daemon=True
+    )
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+class _H2Server:
+    """Cleartext HTTP/2 (prior knowledge) server answering every request with `body`."""
+
+    def __init__(self, body: dict[str, Any], delay: float) -> None:
+        self.body = json.dumps(body).encode()
+        self.delay = delay
+        self.streams: list[int] = []  # concurrent streams, per connection
+        self.peak: list[int] = []  # peak concurrent streams, per connection
+        self.tasks: set[asyncio.Task[None]] = set()
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+        self.server = asyncio.run_coroutine_threadsafe(
+            asyncio.start_server(self._handle, "127.0.0.1", 0), self.loop
+        ).result(5)
+        port = self.server.sockets[0].getsockname()[1]
+        self.url = f"http://127.0.0.1:{port}/siteverify"
+
+    async def _handle(self, reader, writer) -> None:
+        task = asyncio.current_task()
+        assert task is not None
+        self.tasks.add(task)
+        try:
+            await self._serve(reader, writer)
+        finally:
+            self.tasks.discard(task)
+            writer.close()
+
+    async def _serve(self, reader, writer) -> None:
+        import h2.config
+        import h2.connection
+        import h2.events
+
+        conn = h2.connection.H2Connection(h2.config.H2Configuration(client_side=False))
+        conn.initiate_connection()
+        writer.write(conn.data_to_send())
+        index = len(self.streams)
+        self.streams.append(0)
+        self.peak.append(0)
+
+        async def respond(stream_id: int) -> None:
+            await asyncio.sleep(self.delay)
+            self.streams[index] -= 1
+            conn.send_headers(
+                stream_id,
+                [
+                    (":status", "200"),
+                    ("content-type", "application/json"),
+                    ("content-length", str(len(self.body))),
+                ],
+            )
+            conn.send_data(stream_id, self.body, end_stream=True)
+            writer.write(conn.data_to_send())
+
+        while True:
+            data = await reader.read(65535)
+            if not data:
+                break
+            for event in conn.receive_data(data):
+                if isinstance(event, h2.events.RequestReceived):
+                    self.streams[index] += 1
+                    self.peak[index] = max(self.peak[index], self.streams[index])
+                elif isinstance(event, h2.events.DataReceived):
+                    conn.acknowledge_received_data(
+                        event.flow_controlled_length, event.stream_id
+                    )
+                elif isinstance(event, h2.events.StreamEnded):
+                    asyncio.ensure_future(respond(event.stream_id))
+            writer.write(conn.data_to_send())
+
+    async def _close(self) -> None:
+        self.server.close()
+        for task in list(self.tasks):
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+
+    def stop(self) -> None:
+        asyncio.run_coroutine_threadsafe(self._close(), self.loop).result(5)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(5)
+        self.loop.close()
+
+
+@pytest.fixture
+def h2_server(mock_success_response):
+    """
+    A local cleartext HTTP/2 server answering siteverify requests after 50 ms.
+
+    `server.peak` holds the peak number of concurrent streams of each connection.
+    Clients must use prior knowledge: `httpx.Client(http1=False, http2=True)`.
+    """
+    pytest.importorskip("h2")
+    server = _H2Server(mock_success_response, delay=0.05)
+    yield server
+    server.stop()
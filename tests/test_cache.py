@@ -0,0 +1,134 @@
+"""Tests for the negative result cache."""
+
+from __future__ import annotations
+
+import pytest
+
+from pyturnstile._cache import _NegativeCache
+from pyturnstile._types import TurnstileResponse
+
+
+class FakeClock:
+    """Manually advanced clock."""
+
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _failure(*codes: str) -> TurnstileResponse:
+    return TurnstileResponse({"success": False, "error-codes": list(codes)})  # type: ignore
+
+
+class TestNegativeCache:
+    """Test _NegativeCache class."""
+
+    def test_invalid_arguments(self):
+        """Test that non-positive ttl and maxsize are rejected."""
+        with pytest.raises(ValueError):
+            _NegativeCache(ttl=0, maxsize=10)
+        with pytest.raises(ValueError):
+            _NegativeCache(ttl=10, maxsize=0)
+
+    @pytest.mark.parametrize(
+        "codes",
+        [("invalid-input-response",), ("timeout-or-duplicate",)],
+    )
+    def test_stores_terminal_failures(self, codes, mock_token):
+        """Test that terminal failures are cached and returned."""
+        cache = _NegativeCache(ttl=10, maxsize=10)
+
+        assert cache.put(mock_token, _failure(*codes)) is True
+        cached = cache.get(mock_token)
+
+        assert cached is not None
+        assert cached.success is False
+        assert cached.error_codes == list(codes)
+
+    @pytest.mark.parametrize(
+        "codes",
+        [
+            ("internal-error",),
+            ("invalid-input-response", "internal-error"),
+            ("hostname-mismatch",),
+            (),
+        ],
+    )
+    def test_skips_transient_failures(self, codes, mock_token):
+        """Test that failures with non-terminal error codes are not cached."""
+        cache = _NegativeCache(ttl=10, maxsize=10)
+
+        assert cache.put(mock_token, _failure(*codes)) is False
+        assert cache.get(mock_token) is None
+
+    def test_skips_success(self, mock_token, mock_success_response):
+        """Test that successful responses are never cached."""
+        cache = _NegativeCache(ttl=10, maxsize=10)
+
+        assert cache.put(mock_token, TurnstileResponse(mock_success_response)) is False
+
+    def test_returns_independent_copies(self, mock_token):
+        """Test that mutating a cached response does not affect later hits."""
+        cache = _NegativeCache(ttl=10, maxsize=10)
+        cache.put(mock_token, _failure("invalid-input-response"))
+
+        first = cache.get(mock_token)
+        assert first is not None
+        first.error_codes.append("internal-error")
+
+        second = cache.get(mock_token)
+        assert second is not None
+        assert second.error_codes == ["invalid-input-response"]
+
+    def test_expiry(self, mock_token):
+        """Test that entries expire after the ttl."""
+        clock = FakeClock()
+        cache = _NegativeCache(ttl=5, maxsize=10, clock=clock)
+        cache.put(mock_token, _failure("invalid-input-response"))
+
+        clock.now = 4.9
+        assert cache.get(mock_token) is not None
+        clock.now = 5.0
+        assert cache.get(mock_token) is None
+        assert cache.stats()["size"] == 0
+
+    def test_evicts_least_recently_used(self):
+        """Test that the size cap evicts the least recently used entry."""
+        cache = _NegativeCache(ttl=10, maxsize=2)
+        cache.put("a", _failure("invalid-input-response"))
+        cache.put("b", _failure("invalid-input-response"))
+        cache.get("a")
+        cache.put("c", _failure("invalid-input-response"))
+
+        assert cache.get("a") is not None
+        assert cache.get("b") is None
+        assert cache.get("c") is not None
+        assert cache.stats()["evictions"] == 1
+
+    def test_stats(self, mock_token):
+        """Test hit, miss and store counters."""
+        cache = _NegativeCache(ttl=10, maxsize=10)
+        cache.get(mock_token)
+        cache.put(mock_token, _failure("timeout-or-duplicate"))
+        cache.get(mock_token)
+        cache.get(mock_token)
+
+        assert cache.stats() == {
+            "hits": 2,
+            "misses": 1,
+            "stores": 1,
+            "evictions": 0,
+            "size": 1,
+            "maxsize": 10,
+        }
+
+    def test_clear(self, mock_token):
+        """Test that clear drops entries but keeps counters."""
+        cache = _NegativeCache(ttl=10, maxsize=10)
+        cache.put(mock_token, _failure("timeout-or-duplicate"))
+        cache.clear()
+
+        assert cache.get(mock_token) is None
+        assert cache.stats()["stores"] == 1
@@ -0,0 +1,272 @@
+"""Tests for the bulk validation command."""
+
+from __future__ import annotations
+
+import asyncio
+import io
+import json
+import time
+from typing import List
+from urllib.parse import parse_qsl
+
+import pytest
+
+from pyturnstile import AsyncMemoryTransport
+from pyturnstile._cli import main, validate_stream
+
+
+def _jsonl(*records) -> io.StringIO:
+    lines = [r if isinstance(r, str) else json.dumps(r) for r in records]
+    return io.StringIO("\n".join(lines) + "\n")
+
+
+def _results(output: io.StringIO) -> List[dict]:
+    return [json.loads(line) for line in output.getvalue().splitlines()]
+
+
+class _DelayTransport:
+    """Async transport answering after a per-token delay, tracking concurrency."""
+
+    def __init__(self, response: dict, delays: dict) -> None:
+        self.response = response
+        self.delays = delays
+        self.in_flight = 0
+        self.peak = 0
+        self.started: List[float] = []
+
+    async def post(self, url, content, headers, timeout):
+        form = dict(parse_qsl(content.decode()))
+        self.started.append(time.monotonic())
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        await asyncio.sleep(self.delays.get(form["response"], 0))
+        self.in_flight -= 1
+        return {**self.response, "cdata": form["response"]}
+
+    async def aclose(self) -> None:
+        pass
+
+
+class TestValidateStream:
+    """Test validate_stream function."""
+
+    @pytest.mark.asyncio
+    async def test_ordered_results(self, mock_secret, mock_success_response):
+        """Test that results keep input order even when they finish out of order."""
+        transport = _DelayTransport(mock_success_response, {"a": 0.05})
+        output = io.StringIO()
+
+        errors = await validate_stream(
+            _jsonl({"token": "a", "id": "x"}, "", {"token": "b"}),
+            output,
+            secret=mock_secret,
+            transport=transport,
+        )
+
+        results = _results(output)
+        assert errors == 0
+        assert [(r["line"], r["cdata"]) for r in results] == [(1, "a"), (3, "b")]
+        assert results[0]["id"] == "x"
+        assert results[0]["success"] is True
+
+    @pytest.mark.asyncio
+    async def test_unordered_results(self, mock_secret, mock_success_response):
+        """Test that results are written as they complete."""
+        transport = _DelayTransport(mock_success_response, {"a": 0.05})
+        output = io.StringIO()
+
+        await validate_stream(
+            _jsonl({"token": "a"}, {"token": "b"}),
+            output,
+            secret=mock_secret,
+            ordered=False,
+            transport=transport,
+        )
+
+        assert [r["cdata"] for r in _results(output)] == ["b", "a"]
+
+    @pytest.mark.asyncio
+    async def test_record_fields(self, mock_secret, mock_success_response):
+        """Test that per-record options and secrets are sent and checked."""
+        transport = AsyncMemoryTransport(mock_success_response)
+        output = io.StringIO()
+
+        await validate_stream(
+            _jsonl(
+                {"token": "a", "remoteip": "203.0.113.1", "expected_action": "login"},
+                {"token": "b", "secret": "other", "expected_hostname": "other.com"},
+            ),
+            output,
+            secret=mock_secret,
+            transport=transport,
+        )
+
+        assert transport.requests == [
+            {"secret": mock_secret, "response": "a", "remoteip": "203.0.113.1"},
+            {"secret": "other", "response": "b"},
+        ]
+        assert [r["error_codes"] for r in _results(output)] == [
+            [],
+            ["hostname-mismatch"],
+        ]
+
+    @pytest.mark.asyncio
+    async def test_invalid_records(self, mock_secret, mock_success_response):
+        """Test that bad input is reported per line without stopping the run."""
+        output = io.StringIO()
+
+        errors = await validate_stream(
+            _jsonl("not json", {"id": 1}, {"token": "t", "remoteip": 1}),
+            output,
+            secret=mock_secret,
+            transport=AsyncMemoryTransport(mock_success_response),
+        )
+
+        results = _results(output)
+        assert errors == 3
+        assert [r["line"] for r in results] == [1, 2, 3]
+        assert results[1]["id"] == 1
+
+    @pytest.mark.asyncio
+    async def test_null_secret_uses_default(self, mock_secret, mock_success_response):
+        """Test that a null per-record secret falls back to the default secret."""
+        transport = AsyncMemoryTransport(mock_success_response)
+
+        errors = await validate_stream(
+            _jsonl({"token": "a", "secret": None}),
+            io.StringIO(),
+            secret=mock_secret,
+            transport=transport,
+        )
+
+        assert errors == 0
+        assert transport.requests[0]["secret"] == mock_secret
+
+    @pytest.mark.asyncio
+    async def test_missing_secret_stops(self, mock_success_response):
+        """Test that a record without any secret stops the run."""
+        transport = AsyncMemoryTransport(mock_success_response)
+
+        with pytest.raises(ValueError, match="line 2"):
+            await validate_stream(
+                _jsonl({"token": "a", "secret": "s"}, {"token": "b"}),
+                io.StringIO(),
+                concurrency=1,
+                transport=transport,
+            )
+
+    @pytest.mark.asyncio
+    async def test_request_errors(self, mock_secret):
+        """Test that transport failures become error records."""
+
+        def handler(form):
+            raise ConnectionError("down")
+
+        output = io.StringIO()
+        errors = await validate_stream(
+            _jsonl({"token": "t"}),
+            output,
+            secret=mock_secret,
+            transport=AsyncMemoryTransport(handler),
+        )
+
+        assert errors == 1
+        assert "down" in _results(output)[0]["error"]
+
+    @pytest.mark.asyncio
+    async def test_concurrency_limit(self, mock_secret, mock_success_response):
+        """Test that no more than `concurrency` requests are in flight."""
+        tokens = [f"t{i}" for i in range(20)]
+        transport = _DelayTransport(mock_success_response, dict.fromkeys(tokens, 0.01))
+
+        await validate_stream(
+            _jsonl(*({"token": t} for t in tokens)),
+            io.StringIO(),
+            secret=mock_secret,
+            concurrency=3,
+            transport=transport,
+        )
+
+        assert transport.peak == 3
+
+    @pytest.mark.asyncio
+    async def test_rate_limit(self, mock_secret, mock_success_response):
+        """Test that request starts are spaced by the rate limit."""
+        transport = _DelayTransport(mock_success_response, {})
+
+        await validate_stream(
+            _jsonl(*({"token": str(i)} for i in range(4))),
+            io.StringIO(),
+            secret=mock_secret,
+            rate_limit=50,
+            transport=transport,
+        )
+
+        assert transport.started[-1] - transport.started[0] >= 0.055
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize(
+        "options", [{"concurrency": 0}, {"rate_limit": 0}, {"rate_limit": -1}]
+    )
+    async def test_invalid_options(self, options):
+        with pytest.raises(ValueError):
+            await validate_stream(io.StringIO(), io.StringIO(), **options)
+
+
+class TestMain:
+    """Test the command line entry point."""
+
+    def test_files_and_url(self, tmp_path, siteverify_server, mock_secret):
+        """Test reading and writing files against a custom endpoint."""
+        source = tmp_path / "tokens.jsonl"
+        source.write_text('{"token": "a"}\n{"token": "b"}\n')
+        target = tmp_path / "results.jsonl"
+
+        with pytest.raises(SystemExit) as exit_info:
+            main(
+                [
+                    str(source),
+                    "-o",
+                    str(target),
+                    "--secret",
+                    mock_secret,
+                    "--url",
+                    siteverify_server.url,
+                    "--concurrency",
+                    "2",
+                ]
+            )
+
+        assert exit_info.value.code == 0
+        assert [json.loads(line)["line"] for line in target.open()] == [1, 2]
+        assert sorted(r["response"] for r in siteverify_server.requests) == ["a", "b"]
+
+    def test_stdin_and_error_status(self, monkeypatch, capsys, siteverify_server):
+        """Test stdin/stdout and the exit status when records fail."""
+        monkeypatch.setattr("sys.stdin", io.StringIO('{"token": 1}\n'))
+        monkeypatch.setenv("TURNSTILE_SECRET", "env-secret")
+
+        with pytest.raises(SystemExit) as exit_info:
+            main(["--url", siteverify_server.url])
+
+        assert exit_info.value.code == 1
+        assert "Invalid record" in json.loads(capsys.readouterr().out)["error"]
+
+    def test_missing_secret(self, monkeypatch, capsys, siteverify_server):
+        """Test that running without any secret fails once, as a usage error."""
+        monkeypatch.setattr("sys.stdin", io.StringIO('{"token": "a"}\n' * 3))
+        monkeypatch.delenv("TURNSTILE_SECRET", raising=False)
+
+        with pytest.raises(SystemExit) as exit_info:
+            main(["--url", siteverify_server.url])
+
+        captured = capsys.readouterr()
+        assert exit_info.value.code == 2
+        assert captured.out == ""
+        assert captured.err.count("no default was given") == 1
+        assert siteverify_server.requests == []
+
+    def test_rejects_bad_concurrency(self, capsys):
+        with pytest.raises(SystemExit) as exit_info:
+            main(["--concurrency", "0"])
+        assert exit_info.value.code == 2
@@ -3,11 +3,16 @@
 from __future__ import annotations
 
 from unittest.mock import AsyncMock, Mock, patch
+from urllib.parse import parse_qs
 
+import httpx
 import pytest
 
 from pyturnstile._core import (
+    SITEVERIFY_URL,
     _additional_validation,
+    _request_template,
+    _RequestTemplate,
     async_validate,
     validate,
 )
@@ -83,6 +88,41 @@ class TestAdditionalValidation:
         assert "action-mismatch" not in result.error_codes
 
 
+class TestRequestTemplate:
+    """Test _RequestTemplate class."""
+
+    @pytest.mark.parametrize(
+        "token, remoteip, idempotency_key",
+        [
+            ("test-token-12345", None, None),
+            ("a+b/c=d&e f", "2001:db8::1", "uuid-123"),
+            ("0.ZmFrZQ==.tök€n", "192.168.1.1", None),
+        ],
+    )
+    def test_matches_httpx_form_encoding(
+        self, mock_secret, token, remoteip, idempotency_key
+    ):
+        """Test that the pre-encoded body equals what httpx sends for data=."""
+        data = {"secret": mock_secret + "&=", "response": token}
+        if remoteip:
+            data["remoteip"] = remoteip
+        if idempotency_key:
+            data["idempotency_key"] = idempotency_key
+        expected = httpx.Request("POST", SITEVERIFY_URL, data=data)
+
+        template = _RequestTemplate(mock_secret + "&=")
+        content = template.encode(token, remoteip, idempotency_key)
+
+        assert content == expected.read()
+        assert template.headers["Content-Type"] == expected.headers["Content-Type"]
+        assert template.url == str(expected.url)
+
+    def test_template_is_cached_per_secret(self, mock_secret):
+        """Test that templates are built once per secret."""
+        assert _request_template(mock_secret) is _request_template(mock_secret)
+        assert _request_template(mock_secret) is not _request_template("other")
+
+
 class TestValidate:
     """Test synchronous validate function."""
 
@@ -134,8 +174,9 @@ class TestValidate:
 
         assert result.success is True
         call_args = mock_context.post.call_args
-        assert call_args[1]["data"]["remoteip"] == "192.168.1.1"
-        assert call_args[1]["data"]["idempotency_key"] == "uuid-123"
+        form = parse_qs(call_args[1]["content"].decode())
+        assert form["remoteip"] == ["192.168.1.1"]
+        assert form["idempotency_key"] == ["uuid-123"]
 
     @patch("pyturnstile._core.httpx.Client")
     def test_validation_network_error(self, mock_client, mock_token, mock_secret):
@@ -205,8 +246,9 @@ class TestAsyncValidate:
 
         assert result.success is True
         call_args = mock_context.post.call_args
-        assert call_args[1]["data"]["remoteip"] == "192.168.1.1"
-        assert call_args[1]["data"]["idempotency_key"] == "uuid-123"
+        form = parse_qs(call_args[1]["content"].decode())
+        assert form["remoteip"] == ["192.168.1.1"]
+        assert form["idempotency_key"] == ["uuid-123"]
 
     @pytest.mark.asyncio
     @patch("pyturnstile._core.httpx.AsyncClient")
@@ -222,3 +264,49 @@ class TestAsyncValidate:
             await async_validate(token=mock_token, secret=mock_secret)
 
         assert "Turnstile validation failed" in str(exc_info.value)
+
+
+class TestSharedClient:
+    """Test validation through a caller-owned client."""
+
+    def test_validate_uses_given_client(
+        self, mock_token, mock_secret, mock_success_response
+    ):
+        """Test that a shared client is used and left open."""
+        mock_response = Mock()
+        mock_response.json.return_value = mock_success_response
+        client = Mock()
+        client.post = Mock(return_value=mock_response)
+
+        with patch("pyturnstile._core.httpx.Client") as mock_client:
+            result = validate(
+                token=mock_token, secret=mock_secret, timeout=5, client=client
+            )
+
+        assert result.success is True
+        mock_client.assert_not_called()
+        client.close.assert_not_called()
+        assert client.post.call_args[1]["timeout"] == 5
+        form = parse_qs(client.post.call_args[1]["content"].decode())
+        assert form["secret"] == [mock_secret]
+
+    @pytest.mark.asyncio
+    async def test_async_validate_uses_given_client(
+        self, mock_token, mock_secret, mock_success_response
+    ):
+        """Test that a shared async client is used and left open."""
+        mock_response = Mock()
+        mock_response.json.return_value = mock_success_response
+        client = Mock()
+        client.post = AsyncMock(return_value=mock_response)
+        client.aclose = AsyncMock()
+
+        with patch("pyturnstile._core.httpx.AsyncClient") as mock_client:
+            result = await async_validate(
+                token=mock_token, secret=mock_secret, timeout=5, client=client
+            )
+
+        assert result.success is True
+        mock_client.assert_not_called()
+        client.aclose.assert_not_called()
+        assert client.post.call_args[1]["timeout"] == 5
@@ -0,0 +1,513 @@
+"""Tests for the validation sidecar daemon and its Unix socket transports."""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import os
+import shutil
+import socket
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Iterator, List
+from urllib.parse import parse_qs
+
+import pytest
+
+from pyturnstile import (
+    AsyncMemoryTransport,
+    AsyncUnixSocketTransport,
+    MemoryTransport,
+    Turnstile,
+    TurnstileValidationError,
+    UnixSocketTransport,
+    validate,
+)
+from pyturnstile._sidecar import (
+    _LENGTH,
+    MSG_STATS,
+    STATUS_ERROR,
+    STATUS_OK,
+    frame,
+    parse_unix_url,
+)
+from pyturnstile.daemon import TurnstileDaemon, main
+
+pytestmark = pytest.mark.skipif(
+    not hasattr(asyncio, "start_unix_server"), reason="requires Unix sockets"
+)
+
+
+class _UpstreamTransport:
+    """Async transport standing in for Cloudflare, with an optional delay."""
+
+    def __init__(self, response: Any, delay: float = 0) -> None:
+        self.response = response
+        self.delay = delay
+        self.forms: List[dict] = []
+
+    async def post(self, url, content, headers, timeout):
+        self.forms.append({k: v[0] for k, v in parse_qs(content.decode()).items()})
+        await asyncio.sleep(self.delay)
+        if isinstance(self.response, Exception):
+            raise self.response
+        return dict(self.response)
+
+    async def aclose(self) -> None:
+        pass
+
+
+class _RunningDaemon:
+    """A TurnstileDaemon served from an event loop in a background thread."""
+
+    def __init__(self, path: str, upstream: _UpstreamTransport, **options: Any) -> None:
+        self.path = path
+        self.upstream = upstream
+        self.daemon = TurnstileDaemon(path, transport=upstream, **options)
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+        self._run(self.daemon.start())
+
+    def _run(self, coro: Any) -> Any:
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result(5)
+
+    def stop(self) -> None:
+        self._run(self.daemon.close())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+
+@contextlib.contextmanager
+def _dying_daemon(path: str) -> Iterator[None]:
+    """A listener that dies on exit, closing every connection made to it."""
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(path)
+    listener.listen(8)
+    try:
+        yield
+    finally:
+        listener.setblocking(False)
+        while True:
+            try:
+                listener.accept()[0].close()
+            except BlockingIOError:
+                break
+        listener.close()
+        os.unlink(path)
+
+
+@contextlib.contextmanager
+def _vanishing_daemon(path: str) -> Iterator[List[bytes]]:
+    """A listener that reads one request, then closes the connection unanswered."""
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(path)
+    listener.listen(1)
+    requests: List[bytes] = []
+
+    def serve() -> None:
+        conn = listener.accept()[0]
+        with conn:
+            (size,) = _LENGTH.unpack(conn.recv(_LENGTH.size, socket.MSG_WAITALL))
+            requests.append(conn.recv(size, socket.MSG_WAITALL))
+
+    thread = threading.Thread(target=serve, daemon=True)
+    thread.start()
+    try:
+        yield requests
+    finally:
+        thread.join(5)
+        listener.close()
+        os.unlink(path)
+
+
+@pytest.fixture
+def socket_path() -> Iterator[str]:
+    """A short socket path (Unix socket paths are limited to ~100 bytes)."""
+    directory = tempfile.mkdtemp(prefix="pyts-", dir="/tmp")
+    yield os.path.join(directory, "daemon.sock")
+    shutil.rmtree(directory, ignore_errors=True)
+
+
+@pytest.fixture
+def running_daemon(socket_path, mock_success_response) -> Iterator[_RunningDaemon]:
+    running = _RunningDaemon(
+        socket_path, _UpstreamTransport(mock_success_response, delay=0.05)
+    )
+    yield running
+    running.stop()
+
+
+class TestParseUnixUrl:
+    """Test parse_unix_url function."""
+
+    def test_path(self):
+        assert parse_unix_url("unix:///run/pyturnstile.sock") == "/run/pyturnstile.sock"
+
+    @pytest.mark.parametrize("url", ["unix://", "http://localhost/siteverify"])
+    def test_invalid(self, url):
+        with pytest.raises(ValueError):
+            parse_unix_url(url)
+
+    def test_turnstile_rejects_other_urls(self, mock_secret):
+        with pytest.raises(ValueError):
+            Turnstile(mock_secret, transport="http://localhost")
+
+
+class TestTurnstileThroughDaemon:
+    """Test validating through a running daemon."""
+
+    def test_sync_validate(self, running_daemon, mock_secret, mock_token):
+        """Test that the form reaches the daemon's upstream transport."""
+        with Turnstile(
+            mock_secret, transport=f"unix://{running_daemon.path}"
+        ) as turnstile:
+            result = turnstile.validate(mock_token, expected_remoteip="203.0.113.1")
+
+        assert result.success is True
+        assert running_daemon.upstream.forms == [
+            {"secret": mock_secret, "response": mock_token, "remoteip": "203.0.113.1"}
+        ]
+
+    @pytest.mark.asyncio
+    async def test_async_validate(self, running_daemon, mock_secret, mock_token):
+        """Test that the async transport is derived from the URL."""
+        async with Turnstile(
+            mock_secret, transport=f"unix://{running_daemon.path}"
+        ) as turnstile:
+            assert isinstance(turnstile._async_transport, AsyncUnixSocketTransport)
+            result = await turnstile.async_validate(mock_token)
+
+        assert result.success is True
+
+    def test_checks_stay_in_the_worker(self, running_daemon, mock_secret):
+        """Test that hostname checks still apply to the daemon's response."""
+        turnstile = Turnstile(mock_secret, transport=f"unix://{running_daemon.path}")
+
+        result = turnstile.validate("token", expected_hostname="other.com")
+        turnstile.close()
+
+        assert result.error_codes == ["hostname-mismatch"]
+
+    def test_upstream_error(self, socket_path, mock_secret):
+        """Test that upstream failures are reported to the worker."""
+        running = _RunningDaemon(socket_path, _UpstreamTransport(OSError("down")))
+        turnstile = Turnstile(mock_secret, transport=f"unix://{socket_path}")
+        try:
+            with pytest.raises(TurnstileValidationError, match="down"):
+                turnstile.validate("token")
+            assert running.daemon.stats()["errors"] == 1
+        finally:
+            turnstile.close()
+            running.stop()
+
+
+class TestSharedState:
+    """Test the negative cache and counters shared by all workers."""
+
+    def test_negative_cache_is_shared(
+        self, socket_path, mock_secret, mock_failure_response
+    ):
+        """Test that a failure seen by one worker is answered locally for the next."""
+        running = _RunningDaemon(
+            socket_path,
+            _UpstreamTransport(mock_failure_response),
+            negative_cache_ttl=30,
+        )
+        workers = [
+            Turnstile(mock_secret, transport=f"unix://{socket_path}") for _ in range(2)
+        ]
+        try:
+            results = [worker.validate("bad") for worker in workers]
+            stats = running.daemon.stats()
+        finally:
+            for worker in workers:
+                worker.close()
+            running.stop()
+
+        assert len(running.upstream.forms) == 1
+        assert [r.error_codes for r in results] == [["invalid-input-response"]] * 2
+        assert stats["cached"] == 1
+        assert stats["negative_cache"]["hits"] == 1
+
+    @pytest.mark.asyncio
+    async def test_successes_are_not_cached(self, socket_path, mock_success_response):
+        daemon = TurnstileDaemon(
+            socket_path,
+            transport=_UpstreamTransport(mock_success_response),
+            negative_cache_ttl=30,
+        )
+        for _ in range(2):
+            await daemon._validate(1, 5, daemon.url, b"secret=s&response=t")
+
+        assert daemon.transport.forms == [{"secret": "s", "response": "t"}] * 2
+        assert daemon.stats()["cached"] == 0
+
+    @pytest.mark.asyncio
+    async def test_process_counters_are_capped(
+        self, socket_path, mock_success_response
+    ):
+        """Test that only the most recently active workers keep their own counters."""
+        daemon = TurnstileDaemon(
+            socket_path,
+            transport=_UpstreamTransport(mock_success_response),
+            max_processes=2,
+        )
+        for pid in (1, 2, 3, 2):
+            await daemon._validate(pid, 5, daemon.url, b"secret=s&response=%d" % pid)
+        stats = daemon.stats()
+
+        assert list(stats["processes"]) == ["3", "2"]
+        assert stats["requests"] == 4
+
+
+class TestRequestChecks:
+    """Test that the daemon refuses requests it should not forward."""
+
+    def test_other_url_is_rejected(self, running_daemon, mock_secret):
+        """Test that clients cannot make the daemon post to another URL."""
+        transport = UnixSocketTransport(running_daemon.path)
+        try:
+            with pytest.raises(TurnstileValidationError, match="URL not allowed"):
+                validate(
+                    "token",
+                    mock_secret,
+                    transport=transport,
+                    url="http://attacker.example/collect",
+                )
+        finally:
+            transport.close()
+
+        assert running_daemon.upstream.forms == []
+        assert running_daemon.daemon.stats()["errors"] == 1
+
+    def test_malformed_frame(self, running_daemon):
+        """Test that a truncated request gets an error frame, not a dropped connection."""
+
+        def call(sock, payload):
+            sock.sendall(frame(payload))
+            (size,) = _LENGTH.unpack(sock.recv(_LENGTH.size))
+            return sock.recv(size)
+
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(running_daemon.path)
+            sock.settimeout(5)
+            error = call(sock, b"\x01\x00\x00")
+            stats = call(sock, bytes([MSG_STATS]))
+
+        assert error == bytes([STATUS_ERROR]) + b"Malformed request"
+        assert stats[0] == STATUS_OK
+
+
+class TestCoalescing:
+    """Test sharing in-flight validations between workers."""
+
+    def test_concurrent_replay_is_rejected(self, running_daemon, mock_secret):
+        """Test that only the first of several concurrent identical requests succeeds."""
+        turnstile = Turnstile(mock_secret, transport=f"unix://{running_daemon.path}")
+
+        with ThreadPoolExecutor(3) as pool:
+            results = list(pool.map(lambda _: turnstile.validate("same"), range(3)))
+        turnstile.close()
+
+        assert sorted(result.success for result in results) == [False, False, True]
+        assert [r.error_codes for r in results if not r.success] == [
+            ["timeout-or-duplicate"],
+            ["timeout-or-duplicate"],
+        ]
+        assert len(running_daemon.upstream.forms) == 1
+        assert running_daemon.daemon.stats()["processes"] == {
+            str(os.getpid()): {
+                "requests": 3,
+                "coalesced": 0,
+                "rejected": 2,
+                "cached": 0,
+                "errors": 0,
+            }
+        }
+
+    def test_idempotent_repeats_share_result(self, running_daemon, mock_secret):
+        """Test that repeats with the same idempotency key share one upstream call."""
+        turnstile = Turnstile(mock_secret, transport=f"unix://{running_daemon.path}")
+
+        with ThreadPoolExecutor(3) as pool:
+            results = list(
+                pool.map(
+                    lambda _: turnstile.validate("same", idempotency_key="key-1"),
+                    range(3),
+                )
+            )
+        turnstile.close()
+
+        assert all(result.success for result in results)
+        assert len(running_daemon.upstream.forms) == 1
+        stats = running_daemon.daemon.stats()
+        assert (stats["coalesced"], stats["rejected"]) == (2, 0)
+
+    @pytest.mark.asyncio
+    async def test_distinct_tokens_are_not_coalesced(self, running_daemon, mock_secret):
+        """Test that different tokens are all sent upstream."""
+        transport = AsyncUnixSocketTransport(running_daemon.path)
+        turnstile = Turnstile(mock_secret, async_transport=transport)
+
+        await asyncio.gather(*(turnstile.async_validate(t) for t in "abc"))
+        stats = await transport.stats()
+        await transport.aclose()
+
+        assert len(running_daemon.upstream.forms) == 3
+        assert stats["coalesced"] == stats["rejected"] == 0
+        assert stats["in_flight"] == 0
+
+
+class TestFallback:
+    """Test falling back to direct requests when the daemon is down."""
+
+    def test_sync_fallback(self, socket_path, mock_secret, mock_success_response):
+        fallback = MemoryTransport(mock_success_response)
+        transport = UnixSocketTransport(socket_path, fallback=fallback)
+
+        result = Turnstile(mock_secret, transport=transport).validate("token")
+
+        assert result.success is True
+        assert fallback.requests[0]["response"] == "token"
+
+    @pytest.mark.asyncio
+    async def test_async_fallback(
+        self, socket_path, mock_secret, mock_success_response
+    ):
+        fallback = AsyncMemoryTransport(mock_success_response)
+        transport = AsyncUnixSocketTransport(socket_path, fallback=fallback)
+
+        result = await Turnstile(mock_secret, async_transport=transport).async_validate(
+            "token"
+        )
+
+        assert result.success is True
+        assert len(fallback.requests) == 1
+
+    def test_dead_pooled_connection_falls_back(
+        self, socket_path, mock_secret, mock_success_response
+    ):
+        """Test that a pooled connection to a daemon that died is not fatal."""
+        fallback = MemoryTransport(mock_success_response)
+        transport = UnixSocketTransport(socket_path, fallback=fallback)
+        with _dying_daemon(socket_path):
+            assert transport.warmup("https://example.com", 2, 1) == 2
+
+        result = Turnstile(mock_secret, transport=transport).validate("token")
+
+        assert result.success is True
+        assert len(fallback.requests) == 1
+        assert transport._idle == []
+
+    def test_dead_pooled_connection_retries_restarted_daemon(
+        self, socket_path, mock_secret, mock_success_response
+    ):
+        """Test that a stale pooled connection is retried on a fresh one."""
+        fallback = MemoryTransport(mock_success_response)
+        transport = UnixSocketTransport(socket_path, fallback=fallback)
+        with _dying_daemon(socket_path):
+            transport.warmup("https://example.com", 1, 1)
+        running = _RunningDaemon(socket_path, _UpstreamTransport(mock_success_response))
+        try:
+            result = Turnstile(mock_secret, transport=transport).validate("token")
+        finally:
+            transport.close()
+            running.stop()
+
+        assert result.success is True
+        assert fallback.requests == []
+        assert len(running.upstream.forms) == 1
+
+    @pytest.mark.asyncio
+    async def test_async_dead_pooled_connection_falls_back(
+        self, socket_path, mock_secret, mock_success_response
+    ):
+        fallback = AsyncMemoryTransport(mock_success_response)
+        transport = AsyncUnixSocketTransport(socket_path, fallback=fallback)
+        with _dying_daemon(socket_path):
+            assert await transport.warmup("https://example.com", 2, 1) == 2
+
+        result = await Turnstile(mock_secret, async_transport=transport).async_validate(
+            "token"
+        )
+
+        assert result.success is True
+        assert len(fallback.requests) == 1
+
+    def test_unanswered_request_is_not_retried(
+        self, socket_path, mock_secret, mock_success_response
+    ):
+        """Test that a request the daemon read is never sent again."""
+        fallback = MemoryTransport(mock_success_response)
+        transport = UnixSocketTransport(socket_path, fallback=fallback)
+        turnstile = Turnstile(mock_secret, transport=transport)
+        with _vanishing_daemon(socket_path) as requests:
+            with pytest.raises(TurnstileValidationError, match="closed the connection"):
+                turnstile.validate("token")
+
+        assert len(requests) == 1
+        assert fallback.requests == []
+
+    @pytest.mark.asyncio
+    async def test_async_unanswered_request_is_not_retried(
+        self, socket_path, mock_secret, mock_success_response
+    ):
+        fallback = AsyncMemoryTransport(mock_success_response)
+        transport = AsyncUnixSocketTransport(socket_path, fallback=fallback)
+        turnstile = Turnstile(mock_secret, async_transport=transport)
+        with _vanishing_daemon(socket_path) as requests:
+            with pytest.raises(TurnstileValidationError, match="closed the connection"):
+                await turnstile.async_validate("token")
+
+        assert len(requests) == 1
+        assert fallback.requests == []
+
+    def test_warmup_falls_back(self, socket_path):
+        transport = UnixSocketTransport(socket_path, fallback=MemoryTransport({}))
+        assert transport.warmup("https://example.com", 2, 1) == 2
+
+
+class TestDaemon:
+    """Test TurnstileDaemon lifecycle and client warm-up."""
+
+    def test_warmup_opens_daemon_connections(self, running_daemon):
+        transport = UnixSocketTransport(running_daemon.path)
+        try:
+            assert transport.warmup("https://example.com", 3, 1) == 3
+            assert len(transport._idle) == 3
+        finally:
+            transport.close()
+
+    @pytest.mark.asyncio
+    async def test_replaces_stale_socket_and_cleans_up(self, socket_path):
+        with socket.socket(socket.AF_UNIX) as stale:
+            stale.bind(socket_path)  # leaves the socket file behind
+
+        daemon = TurnstileDaemon(socket_path, transport=_UpstreamTransport({}))
+        await daemon.start()
+        assert oct(os.stat(socket_path).st_mode & 0o777) == "0o600"
+        await daemon.close()
+
+        assert not os.path.exists(socket_path)
+
+    def test_close_with_pooled_client_connections(
+        self, socket_path, mock_secret, mock_success_response
+    ):
+        """Test that stopping the daemon does not wait for idle worker connections."""
+        running = _RunningDaemon(socket_path, _UpstreamTransport(mock_success_response))
+        transport = UnixSocketTransport(socket_path)
+        try:
+            Turnstile(mock_secret, transport=transport).validate("token")
+            assert len(transport._idle) == 1
+            running.stop()
+        finally:
+            transport.close()
+
+        assert not os.path.exists(socket_path)
+
+    def test_stats_command(self, running_daemon, capsys):
+        main(["--socket", running_daemon.path, "--stats"])
+        assert '"requests": 0' in capsys.readouterr().out
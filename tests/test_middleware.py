@@ -0,0 +1,375 @@
+"""Tests for the ASGI and WSGI middleware."""
+
+from __future__ import annotations
+
+import asyncio
+import io
+import json
+from typing import Any
+from urllib.parse import urlencode
+
+import pytest
+
+from pyturnstile import (
+    AsyncMemoryTransport,
+    MemoryTransport,
+    Turnstile,
+    TurnstileMiddleware,
+    TurnstileWSGIMiddleware,
+)
+from pyturnstile._middleware import _extract_token
+
+FORM = "application/x-www-form-urlencoded"
+
+
+class TestExtractToken:
+    """Test _extract_token function."""
+
+    def test_header(self):
+        headers = {"cf-turnstile-response": "from-header", "content-type": FORM}
+        body = b"cf-turnstile-response=from-body"
+        assert _extract_token(headers, body, "cf-turnstile-response") == "from-header"
+
+    def test_urlencoded_form(self):
+        body = urlencode({"user": "a", "cf-turnstile-response": "tok+en"}).encode()
+        headers = {"content-type": FORM + "; charset=utf-8"}
+        assert _extract_token(headers, body, "cf-turnstile-response") == "tok+en"
+
+    def test_json(self):
+        body = json.dumps({"cf-turnstile-response": "token"}).encode()
+        headers = {"content-type": "application/json"}
+        assert _extract_token(headers, body, "cf-turnstile-response") == "token"
+
+    @pytest.mark.parametrize(
+        "content_type, body",
+        [
+            ("application/json", b"not json"),
+            ("application/json", b"[1, 2]"),
+            ("multipart/form-data; boundary=x", b"--x--"),
+            (FORM, b"user=a"),
+        ],
+    )
+    def test_missing(self, content_type, body):
+        headers = {"content-type": content_type}
+        assert _extract_token(headers, body, "cf-turnstile-response") is None
+
+
+async def _echo_app(scope, receive, send):
+    """ASGI app that awaits the validation and echoes it with the body."""
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if not message.get("more_body"):
+            break
+    task = scope.get("state", {}).get("turnstile")
+    result = (await task).to_dict() if task is not None else None
+    payload = json.dumps({"body": body.decode(), "result": result}).encode()
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": payload})
+
+
+async def _call_asgi(app, method, path, body=b"", headers=(), chunks=1):
+    scope = {
+        "type": "http",
+        "method": method,
+        "path": path,
+        "headers": [(k.encode(), v.encode()) for k, v in headers],
+        "client": ("203.0.113.1", 1234),
+    }
+    size = max(1, len(body) // chunks + 1)
+    parts = [body[i : i + size] for i in range(0, len(body), size)] or [b""]
+    messages = [
+        {"type": "http.request", "body": part, "more_body": i < len(parts) - 1}
+        for i, part in enumerate(parts)
+    ]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    await app(scope, receive, send)
+    return json.loads(sent[-1]["body"])
+
+
+@pytest.fixture
+def async_transport(mock_success_response) -> AsyncMemoryTransport:
+    return AsyncMemoryTransport(mock_success_response)
+
+
+class TestTurnstileMiddleware:
+    """Test TurnstileMiddleware class."""
+
+    @pytest.mark.asyncio
+    async def test_validates_form_and_replays_body(self, mock_secret, async_transport):
+        """Test that validation starts and the app still receives the full body."""
+        turnstile = Turnstile(mock_secret, async_transport=async_transport)
+        app = TurnstileMiddleware(
+            _echo_app,
+            turnstile,
+            paths={"/login": "login"},
+            expected_hostname="example.com",
+        )
+        body = urlencode({"user": "a", "cf-turnstile-response": "token"})
+
+        response = await _call_asgi(
+            app,
+            "POST",
+            "/login",
+            body.encode(),
+            headers=[("content-type", FORM)],
+            chunks=3,
+        )
+
+        assert response["body"] == body
+        assert response["result"]["success"] is True
+        assert async_transport.requests == [
+            {"secret": mock_secret, "response": "token", "remoteip": "203.0.113.1"}
+        ]
+
+    @pytest.mark.asyncio
+    async def test_action_mismatch(self, mock_secret, async_transport):
+        """Test that the route's expected action is enforced."""
+        turnstile = Turnstile(mock_secret, async_transport=async_transport)
+        app = TurnstileMiddleware(_echo_app, turnstile, paths={"/signup": "signup"})
+
+        response = await _call_asgi(
+            app,
+            "POST",
+            "/signup",
+            headers=[("cf-turnstile-response", "token")],
+        )
+
+        assert response["result"]["error_codes"] == ["action-mismatch"]
+
+    @pytest.mark.asyncio
+    async def test_missing_token_skips_api(self, mock_secret, async_transport):
+        """Test that requests without a token fail without calling the API."""
+        turnstile = Turnstile(mock_secret, async_transport=async_transport)
+        app = TurnstileMiddleware(_echo_app, turnstile)
+
+        response = await _call_asgi(
+            app, "POST", "/any", b"user=a", [("content-type", FORM)]
+        )
+
+        assert response["result"]["error_codes"] == ["missing-input-response"]
+        assert async_transport.requests == []
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("method, path", [("GET", "/login"), ("POST", "/other")])
+    async def test_unmatched_requests_pass_through(
+        self, method, path, mock_secret, async_transport
+    ):
+        """Test that other methods and paths are not validated."""
+        turnstile = Turnstile(mock_secret, async_transport=async_transport)
+        app = TurnstileMiddleware(_echo_app, turnstile, paths={"/login": None})
+
+        response = await _call_asgi(
+            app, method, path, headers=[("cf-turnstile-response", "token")]
+        )
+
+        assert response["result"] is None
+        assert async_transport.requests == []
+
+    @pytest.mark.asyncio
+    async def test_remoteip_header(self, mock_secret, async_transport):
+        """Test reading the visitor IP from a trusted proxy header."""
+        turnstile = Turnstile(mock_secret, async_transport=async_transport)
+        app = TurnstileMiddleware(
+            _echo_app, turnstile, remoteip_header="CF-Connecting-IP"
+        )
+
+        await _call_asgi(
+            app,
+            "POST",
+            "/",
+            headers=[
+                ("cf-turnstile-response", "t"),
+                ("cf-connecting-ip", "2001:db8::1"),
+            ],
+        )
+
+        assert async_transport.requests[0]["remoteip"] == "2001:db8::1"
+
+    @pytest.mark.asyncio
+    async def test_unawaited_task_is_cancelled(self, mock_secret):
+        """Test that validations the app never awaited are cancelled."""
+        tasks = []
+
+        async def app(scope, receive, send):
+            tasks.append(scope["state"]["turnstile"])
+
+        transport = AsyncMemoryTransport({"success": True})
+        turnstile = Turnstile(mock_secret, async_transport=transport)
+        middleware = TurnstileMiddleware(app, turnstile)
+
+        scope = {"type": "http", "method": "POST", "path": "/", "headers": []}
+        scope["headers"] = [(b"cf-turnstile-response", b"token")]
+
+        async def receive():
+            return {"type": "http.request", "body": b""}
+
+        await middleware(scope, receive, None)
+        await asyncio.sleep(0)
+
+        assert tasks[0].cancelled()
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("declare_length", [True, False])
+    async def test_large_body_is_not_buffered(
+        self, declare_length, mock_secret, async_transport
+    ):
+        """Test that bodies over max_body_size pass through without a token lookup."""
+        turnstile = Turnstile(mock_secret, async_transport=async_transport)
+        app = TurnstileMiddleware(_echo_app, turnstile, max_body_size=16)
+        body = urlencode({"cf-turnstile-response": "token", "upload": "x" * 64})
+        headers = [("content-type", FORM)]
+        if declare_length:
+            headers.append(("content-length", str(len(body))))
+
+        response = await _call_asgi(
+            app, "POST", "/", body.encode(), headers=headers, chunks=4
+        )
+
+        assert response["body"] == body
+        assert response["result"]["error_codes"] == ["missing-input-response"]
+        assert async_transport.requests == []
+
+    @pytest.mark.asyncio
+    async def test_large_body_with_header_token(self, mock_secret, async_transport):
+        """Test that a header token is still validated for large bodies."""
+        turnstile = Turnstile(mock_secret, async_transport=async_transport)
+        app = TurnstileMiddleware(_echo_app, turnstile, max_body_size=0)
+
+        response = await _call_asgi(
+            app, "POST", "/", b"x" * 32, headers=[("cf-turnstile-response", "t")]
+        )
+
+        assert response["result"]["success"] is True
+
+    @pytest.mark.asyncio
+    async def test_lifespan_warmup(self, mock_secret, async_transport):
+        """Test that lifespan startup warms the pool."""
+        turnstile = Turnstile(mock_secret, async_transport=async_transport)
+        received = []
+
+        async def app(scope, receive, send):
+            received.append(await receive())
+
+        middleware = TurnstileMiddleware(app, turnstile, warmup_connections=2)
+
+        async def receive():
+            return {"type": "lifespan.startup"}
+
+        await middleware({"type": "lifespan"}, receive, None)
+
+        assert received == [{"type": "lifespan.startup"}]
+        assert turnstile.is_warm is True
+
+
+def _wsgi_app(environ, start_response):
+    body = environ["wsgi.input"].read(int(environ.get("CONTENT_LENGTH") or 0))
+    future = environ.get("pyturnstile.validation")
+    result = future.result().to_dict() if future is not None else None
+    start_response("200 OK", [("Content-Type", "application/json")])
+    return [json.dumps({"body": body.decode(), "result": result}).encode()]
+
+
+def _call_wsgi(app, method, path, body=b"", **environ: Any):
+    environ = {
+        "REQUEST_METHOD": method,
+        "PATH_INFO": path,
+        "CONTENT_LENGTH": str(len(body)),
+        "REMOTE_ADDR": "203.0.113.1",
+        "wsgi.input": io.BytesIO(body),
+        **environ,
+    }
+    return json.loads(b"".join(app(environ, lambda *args: None)))
+
+
+class TestTurnstileWSGIMiddleware:
+    """Test TurnstileWSGIMiddleware class."""
+
+    def test_validates_form_and_replays_body(self, mock_secret, mock_success_response):
+        """Test that validation runs in the pool and the app still gets the body."""
+        transport = MemoryTransport(mock_success_response)
+        app = TurnstileWSGIMiddleware(
+            _wsgi_app,
+            Turnstile(mock_secret, transport=transport),
+            paths={"/login": "login"},
+        )
+        body = urlencode({"user": "a", "cf-turnstile-response": "token"})
+
+        response = _call_wsgi(app, "POST", "/login", body.encode(), CONTENT_TYPE=FORM)
+        app.close()
+
+        assert response["body"] == body
+        assert response["result"]["success"] is True
+        assert transport.requests[0]["remoteip"] == "203.0.113.1"
+
+    def test_header_token_and_remoteip_header(self, mock_secret, mock_success_response):
+        """Test tokens in headers and IPs from a trusted proxy header."""
+        transport = MemoryTransport(mock_success_response)
+        app = TurnstileWSGIMiddleware(
+            _wsgi_app,
+            Turnstile(mock_secret, transport=transport),
+            remoteip_header="CF-Connecting-IP",
+        )
+
+        response = _call_wsgi(
+            app,
+            "POST",
+            "/",
+            HTTP_CF_TURNSTILE_RESPONSE="token",
+            HTTP_CF_CONNECTING_IP="198.51.100.7",
+        )
+        app.close()
+
+        assert response["result"]["success"] is True
+        assert transport.requests[0]["remoteip"] == "198.51.100.7"
+
+    def test_missing_token(self, mock_secret, mock_success_response):
+        """Test that requests without a token fail without calling the API."""
+        transport = MemoryTransport(mock_success_response)
+        app = TurnstileWSGIMiddleware(
+            _wsgi_app, Turnstile(mock_secret, transport=transport)
+        )
+
+        response = _call_wsgi(app, "POST", "/", b"user=a", CONTENT_TYPE=FORM)
+        app.close()
+
+        assert response["result"]["error_codes"] == ["missing-input-response"]
+        assert transport.requests == []
+
+    def test_unmatched_request_passes_through(self, mock_secret, mock_success_response):
+        """Test that unmatched requests are not validated."""
+        transport = MemoryTransport(mock_success_response)
+        app = TurnstileWSGIMiddleware(
+            _wsgi_app,
+            Turnstile(mock_secret, transport=transport),
+            paths={"/login": None},
+        )
+
+        response = _call_wsgi(app, "POST", "/other", HTTP_CF_TURNSTILE_RESPONSE="t")
+        app.close()
+
+        assert response["result"] is None
+        assert transport.requests == []
+
+    def test_large_body_is_not_buffered(self, mock_secret, mock_success_response):
+        """Test that bodies over max_body_size are left unread for the app."""
+        transport = MemoryTransport(mock_success_response)
+        app = TurnstileWSGIMiddleware(
+            _wsgi_app, Turnstile(mock_secret, transport=transport), max_body_size=16
+        )
+        body = urlencode({"cf-turnstile-response": "token", "upload": "x" * 64})
+
+        response = _call_wsgi(app, "POST", "/", body.encode(), CONTENT_TYPE=FORM)
+        app.close()
+
+        assert response["body"] == body
+        assert response["result"]["error_codes"] == ["missing-input-response"]
+        assert transport.requests == []
@@ -0,0 +1,141 @@
+"""Tests for the multi-tenant Turnstile registry."""
+
+from __future__ import annotations
+
+import json
+from typing import Any
+from urllib.parse import parse_qs
+
+import httpx
+import pytest
+
+from pyturnstile import TurnstileRegistry
+
+
+def _handler(secrets: dict[str, dict[str, Any]], seen: list[str]):
+    """Build a mock siteverify handler answering per secret."""
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        form = parse_qs(request.content.decode())
+        secret = form["secret"][0]
+        seen.append(secret)
+        body = secrets.get(
+            secret, {"success": False, "error-codes": ["invalid-input-secret"]}
+        )
+        return httpx.Response(200, content=json.dumps(body))
+
+    return handler
+
+
+@pytest.fixture
+def seen() -> list[str]:
+    return []
+
+
+@pytest.fixture
+def registry(seen, mock_success_response):
+    transport = httpx.MockTransport(
+        _handler(
+            {
+                "shop-secret": mock_success_response,
+                "blog-secret": {**mock_success_response, "hostname": "blog.com"},
+            },
+            seen,
+        )
+    )
+    with httpx.Client(transport=transport) as client:
+        yield TurnstileRegistry(
+            client=client, async_client=httpx.AsyncClient(transport=transport)
+        )
+
+
+class TestTurnstileRegistry:
+    """Test TurnstileRegistry class."""
+
+    def test_register(self, registry):
+        """Test registering and looking up tenants."""
+        shop = registry.register("shop", secret="shop-secret")
+
+        assert "shop" in registry
+        assert registry["shop"] is shop
+        assert len(registry) == 1
+        assert list(registry) == ["shop"]
+
+    def test_tenants_share_clients(self, registry):
+        """Test that every tenant uses the registry's clients."""
+        shop = registry.register("shop", secret="shop-secret")
+        blog = registry.register("blog", secret="blog-secret")
+
+        assert shop._transport is blog._transport is registry._transport
+        assert (
+            shop._async_transport is blog._async_transport is registry._async_transport
+        )
+
+    def test_unregister(self, registry):
+        """Test removing a tenant."""
+        registry.register("shop", secret="shop-secret")
+        registry.unregister("shop")
+
+        assert "shop" not in registry
+        with pytest.raises(KeyError):
+            registry.validate("shop", token="token")
+
+    def test_validate_routes_by_tenant(self, registry, seen):
+        """Test that each tenant validates with its own secret."""
+        registry.register("shop", secret="shop-secret")
+        registry.register("blog", secret="blog-secret")
+
+        assert registry.validate("shop", token="token").hostname == "example.com"
+        assert registry.validate("blog", token="token").hostname == "blog.com"
+        assert seen == ["shop-secret", "blog-secret"]
+
+    def test_tenant_policy(self, registry):
+        """Test default hostname policy and per-call override."""
+        registry.register("shop", secret="shop-secret", expected_hostname="other.com")
+
+        result = registry.validate("shop", token="token")
+        assert result.success is False
+        assert result.error_codes == ["hostname-mismatch"]
+
+        result = registry.validate(
+            "shop", token="token", expected_hostname="example.com"
+        )
+        assert result.success is True
+
+    def test_rotate_secret(self, registry, seen):
+        """Test that the old secret keeps working during rotation."""
+        registry.register("shop", secret="shop-secret")
+        registry.rotate_secret("shop", "unknown-secret", grace_period=60)
+
+        result = registry.validate("shop", token="token")
+
+        assert result.success is True
+        assert seen == ["unknown-secret", "shop-secret"]
+
+    @pytest.mark.asyncio
+    async def test_async_validate(self, registry, seen):
+        """Test async validation through the shared async client."""
+        registry.register("blog", secret="blog-secret", expected_action="login")
+
+        result = await registry.async_validate("blog", token="token")
+
+        assert result.success is True
+        assert seen == ["blog-secret"]
+
+    def test_close_leaves_given_clients_open(self):
+        """Test that caller-owned clients are not closed."""
+        client = httpx.Client()
+        registry = TurnstileRegistry(client=client)
+        registry.close()
+
+        assert client.is_closed is False
+        client.close()
+
+    @pytest.mark.asyncio
+    async def test_aclose_closes_own_clients(self):
+        """Test that clients created by the registry are closed."""
+        registry = TurnstileRegistry()
+        await registry.aclose()
+
+        assert registry._transport.client.is_closed is True
+        assert registry._async_transport.client.is_closed is True
@@ -0,0 +1,353 @@
+"""Tests for pluggable transports."""
+
+from __future__ import annotations
+
+import asyncio
+import socket
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+import pytest
+
+from pyturnstile import (
+    AiohttpTransport,
+    AsyncHttp2Transport,
+    AsyncHttpxTransport,
+    AsyncMemoryTransport,
+    Http2Transport,
+    HttpxTransport,
+    MemoryTransport,
+    Turnstile,
+    TurnstileValidationError,
+    Urllib3Transport,
+    async_validate,
+    validate,
+)
+from pyturnstile._core import SITEVERIFY_URL, _request_template
+
+SYNC_TRANSPORTS = [HttpxTransport, Urllib3Transport]
+ASYNC_TRANSPORTS = [AsyncHttpxTransport, AiohttpTransport]
+
+
+def _request(server, mock_secret, mock_token):
+    template = _request_template(mock_secret)
+    return (server.url, template.encode(mock_token), template.headers, 5)
+
+
+def _make(transport_cls):
+    if transport_cls is Urllib3Transport:
+        pytest.importorskip("urllib3")
+    if transport_cls is AiohttpTransport:
+        pytest.importorskip("aiohttp")
+    return transport_cls()
+
+
+class TestSyncTransports:
+    """Test synchronous transports against a local server."""
+
+    @pytest.mark.parametrize("transport_cls", SYNC_TRANSPORTS)
+    def test_post(
+        self,
+        transport_cls,
+        siteverify_server,
+        mock_secret,
+        mock_token,
+        mock_success_response,
+    ):
+        """Test that the form is sent and the JSON body returned."""
+        transport = _make(transport_cls)
+        try:
+            result = transport.post(
+                *_request(siteverify_server, mock_secret, mock_token)
+            )
+        finally:
+            transport.close()
+
+        assert result == mock_success_response
+        assert siteverify_server.requests == [
+            {"secret": mock_secret, "response": mock_token}
+        ]
+
+    @pytest.mark.parametrize("transport_cls", SYNC_TRANSPORTS)
+    def test_http_error(
+        self, transport_cls, siteverify_server, mock_secret, mock_token
+    ):
+        """Test that non-2xx responses raise."""
+        siteverify_server.responder = lambda form: (500, {})
+        transport = _make(transport_cls)
+        try:
+            with pytest.raises(Exception):
+                transport.post(*_request(siteverify_server, mock_secret, mock_token))
+        finally:
+            transport.close()
+
+
+class TestAsyncTransports:
+    """Test asynchronous transports against a local server."""
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("transport_cls", ASYNC_TRANSPORTS)
+    async def test_post(
+        self,
+        transport_cls,
+        siteverify_server,
+        mock_secret,
+        mock_token,
+        mock_success_response,
+    ):
+        """Test that the form is sent and the JSON body returned."""
+        transport = _make(transport_cls)
+        try:
+            result = await transport.post(
+                *_request(siteverify_server, mock_secret, mock_token)
+            )
+        finally:
+            await transport.aclose()
+
+        assert result == mock_success_response
+        assert siteverify_server.requests == [
+            {"secret": mock_secret, "response": mock_token}
+        ]
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("transport_cls", ASYNC_TRANSPORTS)
+    async def test_http_error(
+        self, transport_cls, siteverify_server, mock_secret, mock_token
+    ):
+        """Test that non-2xx responses raise."""
+        siteverify_server.responder = lambda form: (500, {})
+        transport = _make(transport_cls)
+        try:
+            with pytest.raises(Exception):
+                await transport.post(
+                    *_request(siteverify_server, mock_secret, mock_token)
+                )
+        finally:
+            await transport.aclose()
+
+
+class TestMemoryTransport:
+    """Test in-memory transports."""
+
+    def test_fixed_response(self, mock_secret, mock_token, mock_success_response):
+        """Test a static response and request recording."""
+        transport = MemoryTransport(mock_success_response)
+
+        result = validate(
+            mock_token,
+            mock_secret,
+            expected_remoteip="203.0.113.1",
+            transport=transport,
+        )
+
+        assert result.success is True
+        assert transport.requests == [
+            {
+                "secret": mock_secret,
+                "response": mock_token,
+                "remoteip": "203.0.113.1",
+            }
+        ]
+
+    def test_handler_response_is_copied(self, mock_secret, mock_success_response):
+        """Test that post-processing does not mutate the handler's response."""
+        transport = MemoryTransport(mock_success_response)
+
+        result = validate(
+            "token", mock_secret, expected_hostname="other.com", transport=transport
+        )
+
+        assert result.error_codes == ["hostname-mismatch"]
+        assert mock_success_response["success"] is True
+
+    def test_callable_handler(self, mock_secret, mock_success_response):
+        """Test a handler computing the response from the form."""
+        transport = MemoryTransport(
+            lambda form: {**mock_success_response, "cdata": form["response"]}
+        )
+        turnstile = Turnstile(mock_secret, transport=transport)
+
+        assert turnstile.validate("abc").cdata == "abc"
+
+    def test_handler_exception_is_wrapped(self, mock_secret):
+        """Test that handler errors surface as TurnstileValidationError."""
+
+        def handler(form):
+            raise ConnectionError("down")
+
+        with pytest.raises(TurnstileValidationError):
+            validate("token", mock_secret, transport=MemoryTransport(handler))
+
+    @pytest.mark.asyncio
+    async def test_async_memory_transport(
+        self, mock_secret, mock_token, mock_failure_response
+    ):
+        """Test the async in-memory transport."""
+        transport = AsyncMemoryTransport(mock_failure_response)
+        turnstile = Turnstile(mock_secret, async_transport=transport)
+
+        result = await turnstile.async_validate(mock_token)
+
+        assert result.error_codes == ["invalid-input-response"]
+        assert transport.requests[0]["response"] == mock_token
+
+    @pytest.mark.asyncio
+    async def test_async_validate_with_transport(
+        self, mock_secret, mock_success_response
+    ):
+        """Test that async_validate dispatches through a transport."""
+        transport = AsyncMemoryTransport(mock_success_response)
+
+        result = await async_validate("token", mock_secret, transport=transport)
+
+        assert result.success is True
+
+
+class TestConcurrencyLimit:
+    """Test max_concurrent_requests on the httpx transports."""
+
+    @pytest.mark.asyncio
+    async def test_async_limit(self, mock_secret, mock_token, mock_success_response):
+        """Test that no more than the configured requests are in flight."""
+        in_flight = 0
+        peak = 0
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            return httpx.Response(200, json=mock_success_response)
+
+        transport = AsyncHttpxTransport(
+            httpx.AsyncClient(transport=httpx.MockTransport(handler)),
+            max_concurrent_requests=3,
+        )
+        template = _request_template(mock_secret)
+        await asyncio.gather(
+            *(
+                transport.post(
+                    SITEVERIFY_URL, template.encode(mock_token), template.headers, 5
+                )
+                for _ in range(10)
+            )
+        )
+        await transport.client.aclose()
+
+        assert peak == 3
+
+
+class TestHttp2Transport:
+    """Test spreading HTTP/2 requests over several connections."""
+
+    @staticmethod
+    def _limits() -> httpx.Limits:
+        return httpx.Limits(max_connections=1, max_keepalive_connections=1)
+
+    @pytest.mark.asyncio
+    async def test_async_spreads_streams(self, h2_server, mock_secret, mock_token):
+        """Test that every connection is used, with at most max_streams each."""
+        transport = AsyncHttp2Transport(
+            [
+                httpx.AsyncClient(http1=False, http2=True, limits=self._limits())
+                for _ in range(3)
+            ],
+            max_streams=4,
+        )
+        request = _request(h2_server, mock_secret, mock_token)
+        try:
+            results = await asyncio.gather(
+                *(transport.post(*request) for _ in range(20))
+            )
+        finally:
+            for lane in transport.lanes:
+                await lane.client.aclose()
+
+        assert all(result["success"] for result in results)
+        assert h2_server.peak == [4, 4, 4]
+
+    def test_sync_spreads_streams(self, h2_server, mock_secret, mock_token):
+        transport = Http2Transport(
+            [
+                httpx.Client(http1=False, http2=True, limits=self._limits())
+                for _ in range(2)
+            ],
+            max_streams=2,
+        )
+        request = _request(h2_server, mock_secret, mock_token)
+        try:
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                results = list(
+                    executor.map(lambda _: transport.post(*request), range(8))
+                )
+        finally:
+            for lane in transport.lanes:
+                lane.client.close()
+
+        assert all(result["success"] for result in results)
+        assert h2_server.peak == [2, 2]
+
+    @pytest.mark.asyncio
+    async def test_owned_clients(self):
+        """Test that owned clients hold a single HTTP/2 connection each."""
+        pytest.importorskip("h2")
+        transport = AsyncHttp2Transport(connections=3, max_streams=50)
+        pools = [lane.client._transport._pool for lane in transport.lanes]
+        await transport.aclose()
+
+        assert [(p._http2, p._max_connections) for p in pools] == [(True, 1)] * 3
+        assert {lane.max_concurrent_requests for lane in transport.lanes} == {50}
+        assert all(lane.client.is_closed for lane in transport.lanes)
+
+    def test_invalid_limits(self):
+        with pytest.raises(ValueError):
+            Http2Transport(connections=0)
+
+
+class TestWarmup:
+    """Test transport warm-up."""
+
+    @pytest.mark.parametrize("transport_cls", [HttpxTransport, Urllib3Transport])
+    def test_sync_warmup_opens_connections(self, transport_cls, siteverify_server):
+        """Test that warm-up opens distinct connections concurrently."""
+        transport = _make(transport_cls)
+        try:
+            warmed = transport.warmup(siteverify_server.url, 3, 5)
+        finally:
+            transport.close()
+
+        assert warmed == 3
+        assert len(siteverify_server.connections) == 3
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("transport_cls", ASYNC_TRANSPORTS)
+    async def test_async_warmup_opens_connections(
+        self, transport_cls, siteverify_server
+    ):
+        """Test that async warm-up opens distinct connections concurrently."""
+        transport = _make(transport_cls)
+        try:
+            warmed = await transport.warmup(siteverify_server.url, 3, 5)
+        finally:
+            await transport.aclose()
+
+        assert warmed == 3
+        assert len(siteverify_server.connections) == 3
+
+    def test_warmup_counts_failures(self, unused_url):
+        """Test that unreachable hosts are reported as not warmed."""
+        transport = HttpxTransport()
+        try:
+            assert transport.warmup(unused_url, 2, 1) == 0
+        finally:
+            transport.close()
+
+
+@pytest.fixture
+def unused_url() -> str:
+    """A local URL nothing is listening on."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    return f"http://127.0.0.1:{port}/siteverify"
@@ -2,12 +2,26 @@
 
 from __future__ import annotations
 
-from unittest.mock import Mock, patch
+import asyncio
+import threading
+import time
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import AsyncMock, Mock, patch
 
 import pytest
 
+from pyturnstile._transports import (
+    AsyncHttp2Transport,
+    AsyncHttpxTransport,
+    AsyncMemoryTransport,
+    Http2Transport,
+    HttpxTransport,
+    MemoryTransport,
+)
+from pyturnstile._core import _request_template
 from pyturnstile._turnstile import Turnstile
-from pyturnstile._types import TurnstileResponse
+from pyturnstile._types import TurnstileResponse, TurnstileValidationError
 
 
 class TestTurnstile:
@@ -37,7 +51,10 @@ class TestTurnstile:
             expected_action=None,
             idempotency_key=None,
             timeout=10,
+            transport=turnstile._transport,
+            template=turnstile._template,
         )
+        assert isinstance(turnstile._transport, HttpxTransport)
 
     @patch("pyturnstile._turnstile._core.validate")
     def test_validate_with_all_parameters(self, mock_validate, mock_secret, mock_token):
@@ -65,6 +82,8 @@ class TestTurnstile:
             expected_action="login",
             idempotency_key="uuid-123",
             timeout=15,
+            transport=turnstile._transport,
+            template=turnstile._template,
         )
 
     @pytest.mark.asyncio
@@ -89,6 +108,8 @@ class TestTurnstile:
             expected_action=None,
             idempotency_key=None,
             timeout=10,
+            transport=None,
+            template=turnstile._template,
         )
 
     @pytest.mark.asyncio
@@ -120,4 +141,382 @@ class TestTurnstile:
             expected_action="login",
             idempotency_key="uuid-123",
             timeout=15,
+            transport=None,
+            template=turnstile._template,
         )
+
+
+class TestTurnstileNegativeCache:
+    """Test Turnstile negative result caching."""
+
+    def test_disabled_by_default(self, mock_secret):
+        """Test that no negative cache is created unless configured."""
+        turnstile = Turnstile(secret=mock_secret)
+        assert turnstile.negative_cache_stats is None
+
+    @patch("pyturnstile._turnstile._core.validate")
+    def test_terminal_failure_is_cached(
+        self, mock_validate, mock_secret, mock_token, mock_failure_response
+    ):
+        """Test that a replayed invalid token skips the API call."""
+        mock_validate.return_value = TurnstileResponse(mock_failure_response)
+
+        turnstile = Turnstile(secret=mock_secret, negative_cache_ttl=30)
+        first = turnstile.validate(token=mock_token)
+        second = turnstile.validate(token=mock_token)
+
+        assert first.success is False
+        assert second.success is False
+        assert second.error_codes == ["invalid-input-response"]
+        mock_validate.assert_called_once()
+        stats = turnstile.negative_cache_stats
+        assert stats is not None
+        assert stats["hits"] == 1
+        assert stats["stores"] == 1
+
+    @patch("pyturnstile._turnstile._core.validate")
+    def test_transient_failure_is_not_cached(
+        self, mock_validate, mock_secret, mock_token
+    ):
+        """Test that internal errors always go back to the API."""
+        mock_validate.return_value = TurnstileResponse(
+            {"success": False, "error-codes": ["internal-error"]}  # type: ignore
+        )
+
+        turnstile = Turnstile(secret=mock_secret, negative_cache_ttl=30)
+        turnstile.validate(token=mock_token)
+        turnstile.validate(token=mock_token)
+
+        assert mock_validate.call_count == 2
+
+    @patch("pyturnstile._turnstile._core.validate")
+    def test_exception_is_not_cached(self, mock_validate, mock_secret, mock_token):
+        """Test that transport errors propagate and are not cached."""
+        mock_validate.side_effect = TurnstileValidationError("Network error")
+
+        turnstile = Turnstile(secret=mock_secret, negative_cache_ttl=30)
+        for _ in range(2):
+            with pytest.raises(TurnstileValidationError):
+                turnstile.validate(token=mock_token)
+
+        assert mock_validate.call_count == 2
+        stats = turnstile.negative_cache_stats
+        assert stats is not None
+        assert stats["size"] == 0
+
+    @patch("pyturnstile._turnstile._core.validate")
+    def test_clear_negative_cache(
+        self, mock_validate, mock_secret, mock_token, mock_failure_response
+    ):
+        """Test that clearing the cache forces a new API call."""
+        mock_validate.return_value = TurnstileResponse(mock_failure_response)
+
+        turnstile = Turnstile(secret=mock_secret, negative_cache_ttl=30)
+        turnstile.validate(token=mock_token)
+        turnstile.clear_negative_cache()
+        turnstile.validate(token=mock_token)
+
+        assert mock_validate.call_count == 2
+
+    @pytest.mark.asyncio
+    @patch("pyturnstile._turnstile._core.async_validate")
+    async def test_async_terminal_failure_is_cached(
+        self, mock_async_validate, mock_secret, mock_token, mock_failure_response
+    ):
+        """Test that the async path shares the negative cache."""
+        mock_async_validate.return_value = TurnstileResponse(mock_failure_response)
+
+        turnstile = Turnstile(secret=mock_secret, negative_cache_ttl=30)
+        await turnstile.async_validate(token=mock_token)
+        result = await turnstile.async_validate(token=mock_token)
+
+        assert result.success is False
+        mock_async_validate.assert_called_once()
+
+
+class TestTurnstileSecretRotation:
+    """Test Turnstile secret rotation."""
+
+    @staticmethod
+    def _by_secret(accepted: str, mock_success_response):
+        def fake_validate(*, secret, **kwargs):
+            if secret == accepted:
+                return TurnstileResponse(mock_success_response)
+            return TurnstileResponse(
+                {"success": False, "error-codes": ["invalid-input-secret"]}  # type: ignore
+            )
+
+        return fake_validate
+
+    def test_rotate_secret(self, mock_secret):
+        """Test that rotation replaces the active secret."""
+        turnstile = Turnstile(secret=mock_secret)
+        turnstile.rotate_secret("new-secret")
+        assert turnstile.secret == "new-secret"
+
+    def test_request_template_per_instance(self, mock_secret, mock_success_response):
+        """Test that the template is built with the instance and rebuilt on rotation."""
+        transport = MemoryTransport(mock_success_response)
+        turnstile = Turnstile(secret=mock_secret, transport=transport)
+        template = turnstile._template
+        cache_info = _request_template.cache_info()
+
+        turnstile.validate("a")
+        assert turnstile._template is template
+        turnstile.rotate_secret("new-secret")
+        assert turnstile._template is not template
+        turnstile.validate("b")
+
+        assert _request_template.cache_info() == cache_info
+        assert [r["secret"] for r in transport.requests] == [mock_secret, "new-secret"]
+
+    @patch("pyturnstile._turnstile._core.validate")
+    def test_old_secret_accepted_during_grace_period(
+        self, mock_validate, mock_secret, mock_token, mock_success_response
+    ):
+        """Test fallback to the previous secret on invalid-input-secret."""
+        mock_validate.side_effect = self._by_secret(mock_secret, mock_success_response)
+
+        turnstile = Turnstile(secret=mock_secret)
+        turnstile.rotate_secret("new-secret", grace_period=60)
+        result = turnstile.validate(token=mock_token)
+
+        assert result.success is True
+        secrets = [call[1]["secret"] for call in mock_validate.call_args_list]
+        assert secrets == ["new-secret", mock_secret]
+
+    @patch("pyturnstile._turnstile._core.validate")
+    def test_new_secret_does_not_fall_back(
+        self, mock_validate, mock_secret, mock_token, mock_success_response
+    ):
+        """Test that a successful new secret needs a single request."""
+        mock_validate.side_effect = self._by_secret("new-secret", mock_success_response)
+
+        turnstile = Turnstile(secret=mock_secret)
+        turnstile.rotate_secret("new-secret", grace_period=60)
+        result = turnstile.validate(token=mock_token)
+
+        assert result.success is True
+        mock_validate.assert_called_once()
+
+    @patch("pyturnstile._turnstile.time.monotonic")
+    @patch("pyturnstile._turnstile._core.validate")
+    def test_old_secret_rejected_after_grace_period(
+        self,
+        mock_validate,
+        mock_monotonic,
+        mock_secret,
+        mock_token,
+        mock_success_response,
+    ):
+        """Test that the previous secret is dropped once the grace period ends."""
+        mock_validate.side_effect = self._by_secret(mock_secret, mock_success_response)
+        mock_monotonic.return_value = 100.0
+
+        turnstile = Turnstile(secret=mock_secret)
+        turnstile.rotate_secret("new-secret", grace_period=60)
+        mock_monotonic.return_value = 160.0
+        result = turnstile.validate(token=mock_token)
+
+        assert result.success is False
+        assert result.error_codes == ["invalid-input-secret"]
+        mock_validate.assert_called_once()
+
+    @pytest.mark.asyncio
+    @patch("pyturnstile._turnstile._core.async_validate")
+    async def test_async_old_secret_accepted_during_grace_period(
+        self, mock_async_validate, mock_secret, mock_token, mock_success_response
+    ):
+        """Test async fallback to the previous secret."""
+        fake = self._by_secret(mock_secret, mock_success_response)
+
+        async def fake_async_validate(**kwargs):
+            return fake(**kwargs)
+
+        mock_async_validate.side_effect = fake_async_validate
+
+        turnstile = Turnstile(secret=mock_secret)
+        turnstile.rotate_secret("new-secret", grace_period=60)
+        result = await turnstile.async_validate(token=mock_token)
+
+        assert result.success is True
+        assert mock_async_validate.call_count == 2
+
+
+class TestTurnstileHttp2:
+    """Test Turnstile HTTP/2 mode."""
+
+    @patch("pyturnstile._turnstile._http2_available", return_value=True)
+    def test_http2_creates_owned_pools(self, _mock_available, mock_secret):
+        """Test that HTTP/2 mode spreads requests over owned single-connection clients."""
+        pytest.importorskip("h2")
+        turnstile = Turnstile(
+            secret=mock_secret, http2=True, http2_connections=3, http2_max_streams=50
+        )
+
+        assert isinstance(turnstile._transport, Http2Transport)
+        assert isinstance(turnstile._async_transport, AsyncHttp2Transport)
+        assert len(turnstile._async_transport.lanes) == 3
+        assert turnstile._async_transport.max_streams == 50
+
+        turnstile.close()
+        assert all(lane.client.is_closed for lane in turnstile._transport.lanes)
+
+    @patch("pyturnstile._turnstile._http2_available", return_value=False)
+    def test_http2_falls_back_without_h2(self, _mock_available, mock_secret):
+        """Test the HTTP/1.1 fallback when h2 is missing."""
+        with pytest.warns(RuntimeWarning, match="h2"):
+            turnstile = Turnstile(secret=mock_secret, http2=True)
+
+        assert isinstance(turnstile._async_transport, AsyncHttpxTransport)
+        assert turnstile._async_transport.max_concurrent_requests is None
+        assert turnstile._async_transport.client._transport._pool._http2 is False
+        turnstile.close()
+
+    def test_http2_keeps_given_transports(self, mock_secret, mock_success_response):
+        """Test that explicit transports are not replaced or closed."""
+        transport = MemoryTransport(mock_success_response)
+        with Turnstile(secret=mock_secret, transport=transport, http2=True) as t:
+            assert t._transport is transport
+            assert t._owns_transport is False
+            assert t._owns_async_transport is True
+
+    def test_http2_invalid_limits(self, mock_secret):
+        """Test that non-positive limits are rejected."""
+        with pytest.raises(ValueError):
+            Turnstile(secret=mock_secret, http2=True, http2_connections=0)
+
+    @pytest.mark.asyncio
+    async def test_async_context_manager_closes_pools(self, mock_secret):
+        """Test that aclose closes the owned async pool."""
+        pytest.importorskip("h2")
+        async with Turnstile(secret=mock_secret, http2=True) as turnstile:
+            lanes = turnstile._async_transport.lanes
+
+        assert all(lane.client.is_closed for lane in lanes)
+
+
+class TestTurnstileWarmup:
+    """Test Turnstile connection warm-up and keep-alive."""
+
+    def test_warmup_creates_owned_pool(self, mock_secret, siteverify_server):
+        """Test that warm-up opens pooled connections and reports readiness."""
+        with patch(
+            "pyturnstile._turnstile._core.SITEVERIFY_URL", siteverify_server.url
+        ):
+            turnstile = Turnstile(secret=mock_secret)
+            assert turnstile.is_warm is False
+
+            assert turnstile.warmup(connections=3) == 3
+
+        assert turnstile.is_warm is True
+        assert turnstile._owns_transport is True
+        assert len(siteverify_server.connections) == 3
+        turnstile.close()
+        assert turnstile._transport.client.is_closed is True
+
+    def test_warmup_failure_is_not_ready(self, mock_secret):
+        """Test that failed warm-up leaves the client not ready."""
+        transport = Mock(spec=["post", "close", "warmup"])
+        transport.warmup.return_value = 1
+
+        turnstile = Turnstile(secret=mock_secret, transport=transport)
+
+        assert turnstile.warmup(connections=2) == 1
+        assert turnstile.is_warm is False
+
+    def test_warmup_unsupported_transport(self, mock_secret):
+        """Test that transports without warm-up support are rejected."""
+        transport = Mock(spec=["post", "close"])
+        turnstile = Turnstile(secret=mock_secret, transport=transport)
+
+        with pytest.raises(TypeError):
+            turnstile.warmup()
+
+    def test_keepalive_thread(self, mock_secret):
+        """Test that keep-alive re-runs warm-up until closed."""
+        transport = Mock(spec=["post", "close", "warmup"])
+        transport.warmup.return_value = 1
+
+        turnstile = Turnstile(secret=mock_secret, transport=transport)
+        turnstile.warmup(connections=1, keepalive_interval=0.01)
+        time.sleep(0.1)
+        turnstile.close()
+        calls = transport.warmup.call_count
+        time.sleep(0.05)
+
+        assert calls > 2
+        assert transport.warmup.call_count <= calls + 1
+        transport.close.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_async_warmup_and_keepalive(self, mock_secret):
+        """Test async warm-up with a background keep-alive task."""
+        transport = AsyncMemoryTransport({"success": True})
+        transport.warmup = AsyncMock(side_effect=[2, 2, 0, 0, 0, 0, 0, 0, 0, 0])
+
+        turnstile = Turnstile(secret=mock_secret, async_transport=transport)
+        assert await turnstile.async_warmup(keepalive_interval=0.01) == 2
+        assert turnstile.is_warm is True
+
+        await asyncio.sleep(0.05)
+        assert turnstile.is_warm is False
+        await turnstile.aclose()
+
+        assert turnstile._keepalive_task is None
+        assert transport.warmup.call_count >= 3
+
+
+class TestTurnstileThreading:
+    """Test the sync API from event loops and many threads."""
+
+    @pytest.mark.asyncio
+    async def test_validate_in_event_loop_warns(
+        self, mock_secret, mock_success_response
+    ):
+        """Test that sync calls from a loop thread warn and still run inline."""
+        threads = []
+
+        def handler(form):
+            threads.append(threading.current_thread().name)
+            return mock_success_response
+
+        turnstile = Turnstile(mock_secret, transport=MemoryTransport(handler))
+        with pytest.warns(RuntimeWarning, match="async_validate") as record:
+            result = turnstile.validate("token", expected_action="login")
+
+        assert result.success is True
+        assert threads == [threading.current_thread().name]
+        assert record[0].filename == __file__
+
+    def test_validate_without_loop_does_not_warn(
+        self, mock_secret, mock_success_response
+    ):
+        """Test that sync calls outside a loop do not warn."""
+        turnstile = Turnstile(
+            mock_secret, transport=MemoryTransport(mock_success_response)
+        )
+
+        with warnings.catch_warnings():
+            warnings.simplefilter("error")
+            assert turnstile.validate("token").success is True
+
+    def test_pooled_transport_is_created_once(self, monkeypatch, mock_secret):
+        """Test that threads racing to create the pool share a single transport."""
+        created = []
+
+        def slow_transport():
+            time.sleep(0.01)
+            created.append(MemoryTransport({}))
+            return created[-1]
+
+        monkeypatch.setattr("pyturnstile._turnstile.HttpxTransport", slow_transport)
+        turnstile = Turnstile(mock_secret)
+
+        with ThreadPoolExecutor(8) as pool:
+            transports = list(
+                pool.map(lambda _: turnstile._pooled_transport(), range(8))
+            )
+
+        assert len(created) == 1
+        assert all(transport is created[0] for transport in transports)